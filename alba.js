@@ -25,6 +25,21 @@ function show_version_diff(version) {
   meow();
 }
 
+// Static views, see write_static_views in lb_differ.py: the URL of the
+// pre-rendered page for the given base and head, or null if there is none.
+function static_view_url(oldest, newest) {
+  if (!document.body.dataset.staticViews) {
+    return null;
+  }
+  const name = oldest.join(".") + "-" + newest.join(".");
+  if (!document.body.dataset.staticPairs.split(" ").includes(name)) {
+    return null;
+  }
+  return document.body.dataset.staticViews + name + ".html";
+}
+
+// With static=true in the query, the page is replaced by the static view of
+// the base and head in the query, if there is one.
 function update_from_query() {
   params = (new URL(document.location)).searchParams;
   if (params.has("v")) {
@@ -39,6 +54,15 @@ function update_from_query() {
   if (params.has("show_deleted")) {
     document.querySelector('input[name="show-deleted"]').checked = params.get("show_deleted") === "true";
   }
+  if (params.get("static") === "true") {
+    const url = static_view_url(
+      document.querySelector('input[name="oldest"]:checked').value.split("-").map(x => parseInt(x)),
+      document.querySelector('input[name="newest"]:checked').value.split("-").map(x => parseInt(x)));
+    if (url) {
+      window.location.replace(url);
+      return;
+    }
+  }
   meow(false);
 }
 
@@ -57,6 +81,14 @@ function meow(push_history = true) {
     var newurl = window.location.protocol + "//" + window.location.host + window.location.pathname + '?' + query.join("&") + window.location.hash;
     window.history.pushState({ path: newurl }, '', newurl);
   }
+  const static_view = document.getElementById("static-view");
+  if (static_view) {
+    const url = static_view_url(oldest, newest);
+    static_view.hidden = !url;
+    if (url) {
+      static_view.href = url;
+    }
+  }
   for (var label of document.getElementsByTagName("button")) {
     version = label.className.split("-").slice(-3).map(x => parseInt(x));
     if (older_or_equal(version, oldest)) {
@@ -131,9 +163,145 @@ function meow(push_history = true) {
       div.style = "display:none";
     }
   }
+  if (search_index) {
+    search_paragraphs();
+  }
+}
+
+// Split output: the sections are fetched on demand, see write_split in
+// lb_differ.py.
+var fragment_manifest = null;
+
+function load_fragment(section) {
+  if (!section.fragment_loaded) {
+    section.fragment_loaded = fetch(section.dataset.fragment)
+      .then(response => response.text())
+      .then(text => {
+        section.innerHTML = text;
+        section.style = "";
+        meow(false);
+      });
+  }
+  return section.fragment_loaded;
+}
+
+function go_to_anchor() {
+  const match = window.location.hash.match(/^#p(.+)$/);
+  if (!fragment_manifest || !match || !(match[1] in fragment_manifest.paragraphs)) {
+    return;
+  }
+  const section = document.getElementById("fragment-" + fragment_manifest.paragraphs[match[1]]);
+  load_fragment(section).then(() => document.getElementById("p" + match[1])?.scrollIntoView());
+}
+
+function load_fragments_lazily() {
+  fetch(document.body.dataset.manifest)
+    .then(response => response.json())
+    .then(manifest => {
+      fragment_manifest = manifest;
+      const observer = new IntersectionObserver(entries => {
+        for (var entry of entries) {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            load_fragment(entry.target);
+          }
+        }
+      }, { rootMargin: "100% 0px" });
+      for (var section of document.querySelectorAll("section[data-fragment]")) {
+        observer.observe(section);
+      }
+      go_to_anchor();
+    });
+  addEventListener('hashchange', go_to_anchor);
+}
+
+// Search, see search_index.py.
+var search_index = null;
+var search_shards = {};
+
+function load_search_index() {
+  fetch(document.body.dataset.searchIndex + "index.json")
+    .then(response => response.json())
+    .then(index => {
+      search_index = index;
+      search_paragraphs();
+    });
+  document.getElementById("search").oninput = search_paragraphs;
+}
+
+function get_search_shard(name) {
+  if (!(name in search_shards)) {
+    search_shards[name] = fetch(document.body.dataset.searchIndex + name + ".json")
+      .then(response => response.json());
+  }
+  return search_shards[name];
+}
+
+// The words of the shards that may contain the given word, or, if as_prefix,
+// words starting with it.  A prefix shorter than the shard prefixes is looked
+// up in all the shards that start with it.
+function get_search_shards(word, as_prefix) {
+  const name = Array.from(word).slice(0, search_index.prefix_length)
+    .map(c => c.codePointAt(0).toString(16)).join("-");
+  const names = search_index.shards.filter(shard => shard == name ||
+    (as_prefix && Array.from(word).length < search_index.prefix_length && shard.startsWith(name + "-")));
+  return Promise.all(names.map(get_search_shard))
+    .then(shards => Object.assign({}, ...shards));
+}
+
+// Lists the paragraphs that contain all the words of the query (the last one
+// as a prefix) in some version between the base and the head.
+function search_paragraphs() {
+  const query = document.getElementById("search").value;
+  const results = document.getElementById("search-results");
+  const terms = query.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+  if (!search_index || terms.length == 0) {
+    results.innerHTML = "";
+    return;
+  }
+  oldest = document.querySelector('input[name="oldest"]:checked').value.split("-").map(x => parseInt(x));
+  newest = document.querySelector('input[name="newest"]:checked').value.split("-").map(x => parseInt(x));
+  var range = 0;
+  search_index.versions.forEach((v, j) => {
+    const version = v.split("-").map(x => parseInt(x));
+    if (older_or_equal(oldest, version) && older_or_equal(version, newest)) {
+      range |= 1 << j;
+    }
+  });
+  Promise.all(terms.map((term, i) => get_search_shards(term, i == terms.length - 1).then(shard => {
+    const masks = new Map();
+    for (const word in shard) {
+      if (word == term || (i == terms.length - 1 && word.startsWith(term))) {
+        const postings = shard[word];
+        for (var k = 0; k < postings.length; k += 2) {
+          masks.set(postings[k], (masks.get(postings[k]) || 0) | postings[k + 1]);
+        }
+      }
+    }
+    return masks;
+  }))).then(all_masks => {
+    if (document.getElementById("search").value != query) {
+      return;
+    }
+    var hits = [];
+    for (const [paragraph, mask] of all_masks[0]) {
+      var common = mask & range;
+      for (const masks of all_masks.slice(1)) {
+        common &= masks.get(paragraph) || 0;
+      }
+      if (common) {
+        hits.push(search_index.paragraphs[paragraph]);
+      }
+    }
+    results.innerHTML = hits.map(p => `<li><a href="#p${p}">${p}</a></li>`).join("");
+  });
 }
+
 window.onload = function () {
   for (var input of document.getElementsByTagName("input")) {
+    if (input.type == "search") {
+      continue;
+    }
     input.onclick = meow;
   }
   for (var button of document.getElementsByTagName("button")) {
@@ -141,5 +309,11 @@ window.onload = function () {
     button.onclick = function () { show_version_diff(version); };
   }
   update_from_query();
+  if (document.body.dataset.searchIndex) {
+    load_search_index();
+  }
+  if (document.body.dataset.manifest) {
+    load_fragments_lazily();
+  }
 }
 addEventListener('popstate', update_from_query);
@@ -0,0 +1,118 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from document import is_default_junk, get_granularity
+from historical_diff import SequenceHistory
+import lb_differ
+from lb_rule_extractor import revisions, parse_revision
+
+# Times each stage of the construction of alba.html over the bundled tr14-*.html
+# revisions:
+#   parse: TR14Parser, per revision;
+#   document_diff: lb_differ.apply_version, per version, including the hinted
+#     paragraphs and the diffs of the paragraphs that changed;
+#   paragraph_diff: the word-level diffs of each paragraph against its previous
+#     text, replayed on their own from the built history;
+#   annotations: lb_differ.insert_annotations;
+#   render: lb_differ.write_alba.
+# The results are written as JSON to --out (benchmark.json by default), and the
+# total of each stage is compared with that of --baseline
+# (benchmark_baseline.json by default); the benchmark fails if any stage is
+# slower than the baseline by more than a factor of --threshold.
+# With --repeat=N, the pipeline is run N times, and the fastest time is kept
+# for each item.
+
+args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+
+STAGES = ("parse", "document_diff", "paragraph_diff", "annotations", "render")
+
+# Stages faster than this in the baseline are not compared, as their timings
+# are mostly noise.
+MINIMUM_COMPARED_TIME = 0.05
+
+class Timings:
+  def __init__(self):
+    self.stages = {stage: {} for stage in STAGES}
+
+  @contextlib.contextmanager
+  def time(self, stage, item="total"):
+    start = time.perf_counter()
+    # lb_differ is rather chatty.
+    with contextlib.redirect_stdout(io.StringIO()):
+      yield
+    elapsed = time.perf_counter() - start
+    items = self.stages[stage]
+    items[item] = min(items.get(item, elapsed), elapsed)
+
+def replay_paragraph_diffs(history: SequenceHistory):
+  for _, paragraph in history.elements:
+    replay = SequenceHistory(junk=is_default_junk, get_granularity=get_granularity)
+    replay.tag = paragraph.tag
+    for version in paragraph.versions_changed():
+      tag = copy.copy(paragraph.tag)
+      tag.contents = paragraph.value_at(version)
+      replay.add_version(version, tag.words() if tag.contents else [])
+
+def run(timings: Timings):
+  versions = {}
+  for revision, filename in sorted(revisions.items()):
+    with timings.time("parse", filename):
+      parser = parse_revision(revision, filename)
+    versions[parser.version] = parser.paragraphs
+
+  lb_differ.history = SequenceHistory(element_history=lb_differ.make_sequence_history,
+                                      number_nicely=True)
+  lb_differ.nontrivial_versions.clear()
+  lb_differ.paragraph_markup.clear()
+  for version, paragraphs in versions.items():
+    with timings.time("document_diff", str(version)):
+      lb_differ.apply_version(version, paragraphs)
+  with timings.time("paragraph_diff"):
+    replay_paragraph_diffs(lb_differ.history)
+  with timings.time("annotations"):
+    lb_differ.insert_annotations()
+  with tempfile.TemporaryDirectory() as directory:
+    with timings.time("render"):
+      lb_differ.write_alba(os.path.join(directory, "alba.html"))
+
+def totals(results):
+  return {stage: (items["total"] if "total" in items else sum(items.values()))
+          for stage, items in results["stages"].items()}
+
+if __name__ == "__main__":
+  timings = Timings()
+  for _ in range(int(args.get("repeat", "1"))):
+    run(timings)
+  results = {
+    "python": platform.python_version(),
+    "machine": platform.machine(),
+    "stages": timings.stages,
+  }
+  with open(args.get("out", "benchmark.json"), "w", encoding="utf-8") as f:
+    json.dump(results, f, indent=2)
+
+  baseline_path = args.get("baseline", "benchmark_baseline.json")
+  baseline = None
+  if os.path.exists(baseline_path) and os.path.abspath(baseline_path) != os.path.abspath(args.get("out", "benchmark.json")):
+    with open(baseline_path, encoding="utf-8") as f:
+      baseline = totals(json.load(f))
+  threshold = float(args.get("threshold", "1.5"))
+  failed = []
+  for stage, total in totals(results).items():
+    if baseline and stage in baseline:
+      ratio = total / baseline[stage] if baseline[stage] else float("inf")
+      print(f"{stage:16}{total:10.3f} s{baseline[stage]:10.3f} s{ratio:8.2f}×")
+      if baseline[stage] >= MINIMUM_COMPARED_TIME and ratio > threshold:
+        failed.append(stage)
+    else:
+      print(f"{stage:16}{total:10.3f} s")
+  if failed:
+    print(f"FAILED: {', '.join(failed)} slower than {baseline_path} by more than {threshold}×")
+    sys.exit(1)
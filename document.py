@@ -1,6 +1,14 @@
-import re
+from historical_diff import SequenceHistory
+from segmentation import split_words
 
 class Paragraph:
+  # How changes to paragraphs of this class are diffed; see
+  # historical_diff.SequenceHistory.get_granularity.  Long prose is aligned by
+  # sentences before being diffed word by word; rules and formulae, which are
+  # short and dense, word by word; table rows cell by cell; lines of code are
+  # replaced as a whole.
+  diff_granularity = "sentences"
+
   def __init__(self, contents: str):
     self.contents = contents
 
@@ -11,8 +19,7 @@ class Paragraph:
     return f"<p>{inner}</p>"
 
   def words(self):
-    # TODO(egg): Look at UAX #29.
-    return re.split(r"\b|(?<=\W)(?=\W)|(?=ing\b)|(?<=\uE000)|(?=\uE000)", self.contents)
+    return list(split_words(self.contents))
 
 class Heading(Paragraph):
   def __init__(self, level: int, contents: str):
@@ -23,17 +30,39 @@ class Heading(Paragraph):
     return f"<h{self.level}>{inner}</h{self.level}>"
 
 class Rule(Paragraph):
+  diff_granularity = "elements"
+
   def html(self, inner, version=None):
     return f"<p class=rule>{inner}</p>"
 
 class Formula(Paragraph):
+  diff_granularity = "elements"
+
   def html(self, inner, version=None):
     return f"<p class=formula>{inner}</p>"
 
 class TableRow(Paragraph):
+  diff_granularity = "cells"
+
   def html(self, inner, version=None):
     return f"<table><tr><td>{inner}</td></tr></table>"
 
 class CodeLine(Paragraph):
+  diff_granularity = "whole"
+
   def html(self, inner, version=None):
     return f"<pre><code>{inner}</code></pre>"
+
+# The words ignored when aligning the texts of a paragraph, unless lb_differ.py
+# overrides them for that paragraph.
+def is_default_junk(w):
+  return w.isspace() or w in ".,;:" or w in ("of", "and", "between", "the", "is", "that", "ing")
+
+# Prose paragraphs with fewer tokens than this are diffed word by word rather
+# than aligned by sentences first.
+SENTENCE_DIFF_MINIMUM_TOKENS = 100
+
+def get_granularity(h: SequenceHistory, words):
+  if h.tag.diff_granularity == "sentences" and len(words) < SENTENCE_DIFF_MINIMUM_TOKENS:
+    return "elements"
+  return h.tag.diff_granularity
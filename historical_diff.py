@@ -3,6 +3,7 @@ from functools import total_ordering
 import html
 import itertools
 import re
+import time
 from typing import Optional, Sequence, Tuple, Union
 
 def oxford_list(elements: Sequence[str]):
@@ -103,6 +104,10 @@ def get_inserted_paragraph_number(
   return (ParagraphNumber(*prefix), offset)
 
 class History:
+  # The versions in which this element was added or removed as part of a
+  # phrase moved within its paragraph; see moved_phrases.py.
+  moved_in : Tuple[Version, ...] = ()
+
   def remove(self, version):
     pass
 
@@ -144,6 +149,51 @@ class AtomHistory(History):
   def last_changed(self):
     return self.removed or self.added
 
+# Tokens after which a sentence may end, for the coarse diffs below.
+SENTENCE_END = re.compile(r"[.!?:;]")
+
+# The (begin, end) ranges of the sentences of a sequence of word tokens: a
+# sentence ends at whitespace following a SENTENCE_END token.
+def sentence_ranges(tokens: Sequence[str]) -> list[Tuple[int, int]]:
+  ranges = []
+  begin = 0
+  for i in range(1, len(tokens)):
+    if tokens[i].isspace() and SENTENCE_END.fullmatch(tokens[i - 1]):
+      ranges.append((begin, i + 1))
+      begin = i + 1
+  if begin < len(tokens):
+    ranges.append((begin, len(tokens)))
+  return ranges
+
+# The opcodes of a diff of old and new in which each sentence is a single
+# element, as opcodes over the tokens.
+def sentence_opcodes(old: Sequence[str], new: Sequence[str]):
+  old_ranges = sentence_ranges(old)
+  new_ranges = sentence_ranges(new)
+  old_bounds = [begin for begin, _ in old_ranges] + [len(old)]
+  new_bounds = [begin for begin, _ in new_ranges] + [len(new)]
+  return [(operation, old_bounds[old_begin], old_bounds[old_end],
+           new_bounds[new_begin], new_bounds[new_end])
+          for operation, old_begin, old_end, new_begin, new_end in difflib.SequenceMatcher(
+              None,
+              ["".join(old[b:e]) for b, e in old_ranges],
+              ["".join(new[b:e]) for b, e in new_ranges]).get_opcodes()]
+
+CELL_SEPARATOR = "\uE000"
+
+# The (begin, end) ranges of the cells and separators of a sequence of
+# elements, alternating between cells, which may be empty, and single
+# separators, starting and ending with a cell.
+def cell_ranges(elements: Sequence, separator) -> list[Tuple[int, int]]:
+  ranges = []
+  begin = 0
+  for i, element in enumerate(elements):
+    if element == separator:
+      ranges += [(begin, i), (i, i + 1)]
+      begin = i + 1
+  ranges.append((begin, len(elements)))
+  return ranges
+
 class SequenceHistory(History):
   def __init__(
       self,
@@ -152,7 +202,11 @@ class SequenceHistory(History):
       check_and_get_elements=lambda x, h, version, *context: x,
       number_nicely=False,
       get_ancestor=lambda version, *context: None,
-      get_junk_override=lambda version, *context: None):
+      get_junk_override=lambda version, *context: None,
+      record_diff=None,
+      diff_budget=None,
+      log_diff=None,
+      get_granularity=lambda history, elements: "elements"):
     self.element_history = element_history
     self.elements : list[Tuple[ParagraphNumber, History]] = []
     self.check_and_get_elements = check_and_get_elements
@@ -160,6 +214,25 @@ class SequenceHistory(History):
     self.number_nicely = number_nicely
     self.get_ancestor = get_ancestor
     self.get_junk_override = get_junk_override
+    # If given, called as record_diff(version, old_length, new_length,
+    # opcode_count, seconds, *context) after each diff.
+    self.record_diff = record_diff
+    # If given, the largest product of the old and new lengths for which the
+    # elements are diffed individually; above that, the diff is done by
+    # sentences, and if that is still over budget, the whole text is replaced.
+    self.diff_budget = diff_budget
+    # If given, called as log_diff(version, message, *context) when a diff is
+    # coarsened as above, and when difflib's autojunk heuristic ignores some
+    # popular elements, which it does in sequences of 200 elements or more.
+    self.log_diff = log_diff
+    # Called as get_granularity(self, new_elements) before each diff, returns
+    # one of the following:
+    #   "elements": the elements are diffed individually;
+    #   "cells": the table cells delimited by CELL_SEPARATOR are aligned first,
+    #     and only the elements of the cells that changed are diffed;
+    #   "sentences": likewise with sentences;
+    #   "whole": the elements are replaced wholesale if they changed at all.
+    self.get_granularity = get_granularity
     self.ancestor : Optional[Tuple[Version, ParagraphNumber, SequenceHistory]] = None
     self.descendants : dict[Version, list[ParagraphNumber]] = {}
     self.references = []
@@ -217,10 +290,14 @@ class SequenceHistory(History):
       else:
         indexing.append((None, (n, c)))
 
-    diff = difflib.SequenceMatcher(
-      self.get_junk_override(version, *context) or self.junk,
-      [c.value() for _, c in self.elements if c.present()],
-      [self.element_history(version, element, None).value() for element in new_text]).get_opcodes()
+    old_values = [c.value() for _, c in self.elements if c.present()]
+    new_values = [self.element_history(version, element, None).value() for element in new_text]
+    if self.record_diff:
+      start = time.perf_counter()
+    diff = self.get_opcodes(old_values, new_values, version, *context)
+    if self.record_diff:
+      self.record_diff(version, len(old_values), len(new_values), len(diff),
+                       time.perf_counter() - start, *context)
     text_changed = False
     for instruction in diff:
       (operation, old_begin, old_end, new_begin, new_end) = instruction
@@ -310,6 +387,72 @@ class SequenceHistory(History):
     self.elements = [c for _, c in indexing]
     return text_changed
 
+  def get_opcodes(self, old_values, new_values, version, *context):
+    granularity = self.get_granularity(self, new_values)
+    if granularity == "cells" and CELL_SEPARATOR in old_values and CELL_SEPARATOR in new_values:
+      return self.get_segmented_opcodes(cell_ranges(old_values, CELL_SEPARATOR),
+                                        cell_ranges(new_values, CELL_SEPARATOR),
+                                        old_values, new_values, version, *context)
+    elif granularity == "sentences":
+      return self.get_segmented_opcodes(sentence_ranges(old_values), sentence_ranges(new_values),
+                                        old_values, new_values, version, *context)
+    elif granularity == "whole" and old_values and new_values:
+      if old_values == new_values:
+        return [("equal", 0, len(old_values), 0, len(new_values))]
+      return [("replace", 0, len(old_values), 0, len(new_values))]
+    return self.get_element_opcodes(old_values, new_values, version, *context)
+
+  # The segments of old and new, given as (begin, end) ranges covering them,
+  # are diffed as whole strings; runs of changed segments that pair up
+  # one-to-one are then diffed segment by segment, and other changed runs
+  # element by element.
+  def get_segmented_opcodes(self, old_segments, new_segments, old_values, new_values, version, *context):
+    opcodes = []
+    def add(opcodes_in_range, old_offset, new_offset):
+      for operation, old_begin, old_end, new_begin, new_end in opcodes_in_range:
+        if old_begin < old_end or new_begin < new_end:
+          opcodes.append((operation, old_offset + old_begin, old_offset + old_end,
+                          new_offset + new_begin, new_offset + new_end))
+    for operation, old_begin, old_end, new_begin, new_end in difflib.SequenceMatcher(
+        None,
+        ["".join(old_values[b:e]) for b, e in old_segments],
+        ["".join(new_values[b:e]) for b, e in new_segments]).get_opcodes():
+      if operation == "replace" and old_end - old_begin == new_end - new_begin:
+        for (old_b, old_e), (new_b, new_e) in zip(old_segments[old_begin:old_end],
+                                                  new_segments[new_begin:new_end]):
+          add(self.get_element_opcodes(old_values[old_b:old_e], new_values[new_b:new_e], version, *context),
+              old_b, new_b)
+        continue
+      old_b = old_segments[old_begin][0] if old_begin < len(old_segments) else len(old_values)
+      old_e = old_segments[old_end - 1][1] if old_end > old_begin else old_b
+      new_b = new_segments[new_begin][0] if new_begin < len(new_segments) else len(new_values)
+      new_e = new_segments[new_end - 1][1] if new_end > new_begin else new_b
+      if operation == "equal":
+        add([("equal", 0, old_e - old_b, 0, new_e - new_b)], old_b, new_b)
+      else:
+        add(self.get_element_opcodes(old_values[old_b:old_e], new_values[new_b:new_e], version, *context),
+            old_b, new_b)
+    return opcodes
+
+  def get_element_opcodes(self, old_values, new_values, version, *context):
+    if self.diff_budget is not None and len(old_values) * len(new_values) > self.diff_budget:
+      if len(sentence_ranges(old_values)) * len(sentence_ranges(new_values)) <= self.diff_budget:
+        if self.log_diff:
+          self.log_diff(version, f"diffing {len(old_values)}×{len(new_values)} tokens by sentences", *context)
+        return sentence_opcodes(old_values, new_values)
+      if self.log_diff:
+        self.log_diff(version, f"replacing {len(old_values)}×{len(new_values)} tokens", *context)
+      if old_values == new_values:
+        return [("equal", 0, len(old_values), 0, len(new_values))]
+      return [("replace", 0, len(old_values), 0, len(new_values))]
+    matcher = difflib.SequenceMatcher(
+      self.get_junk_override(version, *context) or self.junk,
+      old_values,
+      new_values)
+    if self.log_diff and old_values and matcher.bpopular:
+      self.log_diff(version, f"autojunk ignores {sorted(matcher.bpopular)} among {len(new_values)} tokens", *context)
+    return matcher.get_opcodes()
+
   def html(self):
     text = ""
     if self.ancestor:
@@ -335,11 +478,13 @@ class SequenceHistory(History):
     text += deletion_note
     previous_added = None
     added = None
+    added_moved = False
     removed = None
+    removed_moved = False
     for _, c in self.elements:
-      if not c.value:
+      if not c.value():
         continue
-      if c.value() == "\uE000":
+      if c.value() == CELL_SEPARATOR:
         if added:
           text += "</ins>"
           previous_added = None
@@ -350,7 +495,7 @@ class SequenceHistory(History):
         text += "</td><td>"
         continue
 
-      if c.removed != removed:
+      if c.removed != removed or (c.removed in c.moved_in) != removed_moved:
         if added:
           text += "</ins>"
           previous_added = added
@@ -358,17 +503,19 @@ class SequenceHistory(History):
         if removed:
           text += "</del>"
         removed = c.removed
+        removed_moved = removed in c.moved_in
         if removed:
           if previous_added == removed:
             text += "<wbr>"
-          text += f'<del class="changed-in-{removed.html_class()}">'
-      if c.added != added:
+          text += f'<del class="{"moved " if removed_moved else ""}changed-in-{removed.html_class()}">'
+      if c.added != added or (c.added in c.moved_in) != added_moved:
         if added:
           text += "</ins>"
         previous_added = added
         added = c.added
+        added_moved = added in c.moved_in
         if added:
-          text += f'<ins class="changed-in-{added.html_class()}">'
+          text += f'<ins class="{"moved " if added_moved else ""}changed-in-{added.html_class()}">'
       text += html.escape(c.value()).replace('\u2028', '<br>')
     if added:
       text += "</ins>"
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import sys
+from typing import Sequence
+
+from historical_diff import Version, SequenceHistory
+
+# SQLite store of a built history.  The paragraphs are stored in document
+# order, with their text at every version in which they are present, and the
+# provenance of each of their tokens; paragraph_texts_fts is an FTS5 index
+# over the per-version texts.
+
+SCHEMA = """
+CREATE TABLE versions (
+  id INTEGER PRIMARY KEY,  -- In chronological order.
+  version TEXT NOT NULL UNIQUE);
+CREATE TABLE paragraphs (
+  id INTEGER PRIMARY KEY,  -- In document order.
+  number TEXT NOT NULL UNIQUE,
+  tag TEXT NOT NULL,
+  version_added TEXT NOT NULL,
+  last_changed TEXT NOT NULL,
+  present INTEGER NOT NULL,
+  ancestor_version TEXT,
+  ancestor TEXT);
+CREATE TABLE paragraph_texts (
+  id INTEGER PRIMARY KEY,
+  paragraph_id INTEGER NOT NULL REFERENCES paragraphs(id),
+  version_id INTEGER NOT NULL REFERENCES versions(id),
+  text TEXT NOT NULL);
+CREATE INDEX paragraph_texts_by_paragraph ON paragraph_texts(paragraph_id, version_id);
+CREATE TABLE tokens (
+  paragraph_id INTEGER NOT NULL REFERENCES paragraphs(id),
+  position INTEGER NOT NULL,
+  text TEXT NOT NULL,
+  added TEXT NOT NULL,
+  removed TEXT,
+  moved_in TEXT,  -- Comma-separated versions in which the token was moved, see moved_phrases.py.
+  PRIMARY KEY (paragraph_id, position)) WITHOUT ROWID;
+CREATE TABLE issues (
+  id INTEGER PRIMARY KEY,
+  version TEXT NOT NULL,
+  source_line INTEGER NOT NULL,
+  l2_refs TEXT NOT NULL,  -- Comma-separated.
+  l2_docs TEXT NOT NULL,
+  pri TEXT NOT NULL);
+CREATE TABLE paragraph_issues (
+  paragraph_id INTEGER NOT NULL REFERENCES paragraphs(id),
+  issue_id INTEGER NOT NULL REFERENCES issues(id),
+  PRIMARY KEY (paragraph_id, issue_id)) WITHOUT ROWID;
+CREATE TABLE annotations (
+  paragraph_id INTEGER PRIMARY KEY REFERENCES paragraphs(id),
+  issue_id INTEGER NOT NULL REFERENCES issues(id),
+  kind TEXT);
+CREATE VIRTUAL TABLE paragraph_texts_fts USING fts5(
+  text, content='paragraph_texts', content_rowid='id');
+"""
+
+def write_sqlite(history: SequenceHistory, versions: Sequence[Version], path: str):
+  # Imported here, since building ISSUES takes most of the startup time of the
+  # query command line.
+  from annotations import Annotation, ISSUES
+  if os.path.exists(path):
+    os.remove(path)
+  db = sqlite3.connect(path)
+  db.executescript(SCHEMA)
+  version_ids = {version: i for i, version in enumerate(versions)}
+  db.executemany("INSERT INTO versions VALUES (?, ?)",
+                 ((i, str(version)) for version, i in version_ids.items()))
+  issue_ids = {issue: i for i, issue in enumerate(ISSUES)}
+  db.executemany("INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?)",
+                 ((i, str(issue.version), issue.source_line, ",".join(issue.l2_refs),
+                   ",".join(issue.l2_docs), ",".join(issue.pri))
+                  for issue, i in issue_ids.items()))
+  annotation_issues = {annotation.number: issue
+                       for issue in ISSUES for annotation in issue.annotations}
+  for i, (paragraph_number, paragraph) in enumerate(history.elements):
+    db.execute("INSERT INTO paragraphs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+               (i, str(paragraph_number), type(paragraph.tag).__name__,
+                str(paragraph.version_added()), str(paragraph.last_changed()),
+                1 if paragraph.present() else 0,
+                str(paragraph.ancestor[0]) if paragraph.ancestor else None,
+                str(paragraph.ancestor[1]) if paragraph.ancestor else None))
+    db.executemany("INSERT INTO paragraph_texts(paragraph_id, version_id, text) VALUES (?, ?, ?)",
+                   ((i, version_id, text) for version, version_id in version_ids.items()
+                    for text in (paragraph.value_at(version),) if text))
+    db.executemany("INSERT INTO tokens VALUES (?, ?, ?, ?, ?, ?)",
+                   ((i, position, c.text, str(c.added), str(c.removed) if c.removed else None,
+                     ",".join(str(v) for v in c.moved_in) or None)
+                    for position, (_, c) in enumerate(paragraph.elements)))
+    db.executemany("INSERT OR IGNORE INTO paragraph_issues VALUES (?, ?)",
+                   ((i, issue_ids[issue]) for issue in paragraph.references))
+    if isinstance(paragraph.tag, Annotation):
+      db.execute("INSERT INTO annotations VALUES (?, ?, ?)",
+                 (i, issue_ids[annotation_issues[paragraph_number]], paragraph.tag.kind()))
+  db.execute("INSERT INTO paragraph_texts_fts(paragraph_texts_fts) VALUES ('rebuild')")
+  db.commit()
+  db.close()
+
+# Returns (paragraph number, [versions], text in the last of those versions)
+# for each paragraph whose text matches the FTS5 query in some version, in
+# document order, optionally restricted to the given version and to paragraphs
+# whose text starts with the given prefix in the matching version.
+def search(db: sqlite3.Connection, query: str, version: str = None, starts_with: str = None):
+  results = db.execute("""
+      SELECT paragraphs.number, versions.version, paragraph_texts.text
+      FROM paragraph_texts_fts
+      JOIN paragraph_texts ON paragraph_texts.id = paragraph_texts_fts.rowid
+      JOIN paragraphs ON paragraphs.id = paragraph_texts.paragraph_id
+      JOIN versions ON versions.id = paragraph_texts.version_id
+      WHERE paragraph_texts_fts MATCH ?
+        AND (?2 IS NULL OR versions.version = ?2)
+        AND (?3 IS NULL OR substr(paragraph_texts.text, 1, length(?3)) = ?3)
+      ORDER BY paragraphs.id, versions.id""", (query, version, starts_with))
+  matches = []
+  for number, v, text in results:
+    if matches and matches[-1][0] == number:
+      matches[-1][1].append(v)
+      matches[-1][2] = text
+    else:
+      matches.append([number, [v], text])
+  return matches
+
+if __name__ == "__main__":
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  path = args.get("db", "alba.sqlite")
+  if "search" not in args or not os.path.exists(path):
+    if "search" in args:
+      print(f"{path} not found; it is written by lb_differ.py --sqlite={path}.")
+    print("Usage: history_db.py [--db=alba.sqlite] --search=QUERY [--version=16.0.0] [--starts-with=LB21a]")
+    print("QUERY uses the FTS5 query syntax, e.g., --search=hyphen or --search='\"zero width\"'.")
+    sys.exit(1)
+  # Read-only, so that a mistyped --db does not create an empty database.
+  db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+  try:
+    results = search(db, args["search"], args.get("version"), args.get("starts-with"))
+  except sqlite3.OperationalError as e:
+    print(f"Cannot search {path}: {e}")
+    print("QUERY uses the FTS5 query syntax, e.g., --search=hyphen or --search='\"zero width\"'.")
+    sys.exit(1)
+  for number, versions, text in results:
+    print(f"{number}: {', '.join(versions)}")
+    print(f"    {text}")
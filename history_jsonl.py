@@ -0,0 +1,126 @@
+import json
+from typing import Iterator, Optional, TextIO
+
+import annotations
+from annotations import Annotation, ISSUES
+import document
+from historical_diff import Version, ParagraphNumber, SequenceHistory, AtomHistory, CELL_SEPARATOR
+
+# JSON Lines export of a built history, one record per element of
+# history.elements, in document order.  Each record is an object with the
+# following fields:
+#   number: the paragraph number, as a list of components, e.g., [596, -3, 1]
+#     for 596.-3.1, or [10, "a"] for the annotation 10.a.
+#   tag: the name of the class of the paragraph in its latest version, one of
+#     the classes of document.py or annotations.py.
+#   level: the heading level if tag is Heading, otherwise absent.
+#   contents: the text of the paragraph in the version in which it acquired
+#     its current tag.
+#   ancestor: if the paragraph was moved or split from another one, an object
+#     {"version": "4.0.0", "number": [...]}, otherwise null.
+#   descendants: an object mapping versions to the list of the numbers of the
+#     paragraphs that parts of this paragraph were moved or split into.
+#   references: the issues attributed to the paragraph, as objects with the
+#     fields version, l2_refs, l2_docs, pri, and source_line, the line of
+#     annotations.py at which the issue is defined.
+#   runs: the text of the paragraph across all versions, as a list of
+#     [text, added, removed] triples, where added is the version in which the
+#     text was added, and removed is the version in which it was removed, or
+#     null; text that was part of a phrase moved within the paragraph (see
+#     moved_phrases.py) has a fourth element, the list of the versions in which
+#     it was moved.  Consecutive tokens with the same added, removed, and moved
+#     versions are merged, except for table cell separators (U+E000), which are
+#     always a run of their own.
+# Versions are strings of the form "16.0.0".
+
+def _version(v: Optional[Version]):
+  return str(v) if v else None
+
+def _parse_version(s: Optional[str]):
+  return Version(*(int(c) for c in s.split("."))) if s else None
+
+def _number(n: ParagraphNumber):
+  return [*n.main, *n.annotation]
+
+def _runs(paragraph: SequenceHistory):
+  runs = []
+  for _, c in paragraph.elements:
+    run = [c.text, _version(c.added), _version(c.removed)]
+    if c.moved_in:
+      run.append([_version(v) for v in c.moved_in])
+    if (runs and c.text != CELL_SEPARATOR and runs[-1][0] != CELL_SEPARATOR and
+        runs[-1][1:] == run[1:]):
+      runs[-1][0] += c.text
+    else:
+      runs.append(run)
+  return runs
+
+def paragraph_record(paragraph_number: ParagraphNumber, paragraph: SequenceHistory):
+  record = {
+    "number": _number(paragraph_number),
+    "tag": type(paragraph.tag).__name__,
+  }
+  if isinstance(paragraph.tag, document.Heading):
+    record["level"] = paragraph.tag.level
+  record["contents"] = paragraph.tag.contents
+  record["ancestor"] = ({"version": _version(paragraph.ancestor[0]),
+                         "number": _number(paragraph.ancestor[1])}
+                        if paragraph.ancestor else None)
+  record["descendants"] = {_version(version): [_number(n) for n in descendants]
+                           for version, descendants in paragraph.descendants.items()}
+  record["references"] = [{"version": _version(issue.version),
+                           "l2_refs": list(issue.l2_refs),
+                           "l2_docs": list(issue.l2_docs),
+                           "pri": list(issue.pri),
+                           "source_line": issue.source_line}
+                          for issue in paragraph.references]
+  record["runs"] = _runs(paragraph)
+  return record
+
+def write_jsonl(history: SequenceHistory, f: TextIO):
+  for paragraph_number, paragraph in history.elements:
+    print(json.dumps(paragraph_record(paragraph_number, paragraph), ensure_ascii=False), file=f)
+
+def read_jsonl(f: TextIO) -> Iterator[dict]:
+  for line in f:
+    if line.strip():
+      yield json.loads(line)
+
+def _tag(record: dict):
+  if record["tag"] == "Heading":
+    return document.Heading(record["level"], record["contents"])
+  cls = getattr(document, record["tag"], None) or getattr(annotations, record["tag"])
+  if issubclass(cls, Annotation):
+    return cls(tuple(record["number"]), record["contents"])
+  return cls(record["contents"])
+
+# Rebuilds the history written by write_jsonl, without recomputing any diffs.
+# Each run becomes a single AtomHistory, so that value_at, versions_changed,
+# html, etc. behave as on the original history.  References are resolved to
+# the corresponding annotations.ISSUES where possible, and otherwise left as
+# dictionaries.
+def load_jsonl(f: TextIO) -> SequenceHistory:
+  issues = {issue.source_line: issue for issue in ISSUES}
+  history = SequenceHistory()
+  ancestors = []
+  for record in read_jsonl(f):
+    paragraph = SequenceHistory()
+    paragraph.tag = _tag(record)
+    for i, (text, added, removed, *moved_in) in enumerate(record["runs"]):
+      run = AtomHistory(_parse_version(added), text)
+      run.removed = _parse_version(removed)
+      if moved_in:
+        run.moved_in = tuple(_parse_version(v) for v in moved_in[0])
+      paragraph.elements.append((ParagraphNumber(i + 1), run))
+    paragraph.descendants = {_parse_version(version): [ParagraphNumber(*n) for n in descendants]
+                             for version, descendants in record["descendants"].items()}
+    paragraph.references = [issues.get(reference["source_line"], reference)
+                            for reference in record["references"]]
+    if record["ancestor"]:
+      ancestors.append((paragraph, _parse_version(record["ancestor"]["version"]),
+                        ParagraphNumber(*record["ancestor"]["number"])))
+    history.elements.append((ParagraphNumber(*record["number"]), paragraph))
+  paragraphs = dict(history.elements)
+  for paragraph, version, number in ancestors:
+    paragraph.ancestor = (version, number, paragraphs[number])
+  return history
@@ -0,0 +1,74 @@
+import datetime
+import re
+from typing import Optional, Sequence, TextIO
+
+from annotations import Issue
+from historical_diff import ParagraphNumber, SequenceHistory
+from utc_calendar import OFFSET, UTC
+
+# The dates of the decisions behind the issues of annotations.py, obtained
+# from the UTC meetings of their L2 references: the L2 reference 180-C18 is
+# item C18 of the minutes of UTC #180, whose date is that of UTC[180 - OFFSET]
+# in utc_calendar.py.  The decision on an issue is taken to be at the latest of
+# its meetings.  Issues without L2 references (or with references to meetings
+# missing from the calendar) have no decision date.
+
+L2_REF = re.compile(r"(\d+)-")
+
+def meeting_number(l2_ref: str) -> Optional[int]:
+  match = L2_REF.match(l2_ref)
+  return int(match.group(1)) if match else None
+
+def meeting_date(number: int) -> Optional[datetime.date]:
+  i = number - OFFSET
+  return UTC[i][0] if 0 <= i < len(UTC) else None
+
+class IssueTimeline:
+  def __init__(self, issues: Sequence[Issue]):
+    self.issues = issues
+    # The (meeting number, date) of each meeting of each issue, in order.
+    self.meetings : dict[Issue, list[tuple[int, datetime.date]]] = {}
+    self.decisions : dict[Issue, tuple[int, datetime.date]] = {}
+    for issue in issues:
+      meetings = set()
+      for l2_ref in issue.l2_refs:
+        number = meeting_number(l2_ref)
+        if number is not None and meeting_date(number):
+          meetings.add((number, meeting_date(number)))
+      self.meetings[issue] = sorted(meetings)
+      if meetings:
+        self.decisions[issue] = max(meetings)
+
+  # The (meeting number, date) of the decision on the issue, or None.
+  def decision(self, issue: Issue) -> Optional[tuple[int, datetime.date]]:
+    return self.decisions.get(issue)
+
+  # The issues with a decision date, in order of decision.
+  def by_date(self) -> list[Issue]:
+    return sorted(self.decisions, key=lambda issue: (self.decisions[issue][1], issue.source_line))
+
+  # The (meeting number, date, issue) of the decisions behind the changes to
+  # each paragraph of a built history, in order of decision.
+  def paragraph_decisions(self, history: SequenceHistory) -> dict[ParagraphNumber, list[tuple[int, datetime.date, Issue]]]:
+    decisions = {}
+    for paragraph_number, paragraph in history.elements:
+      paragraph_decisions = sorted(((*self.decisions[issue], issue) for issue in paragraph.references
+                                    if issue in self.decisions),
+                                   key=lambda d: (d[1], d[2].source_line))
+      if paragraph_decisions:
+        decisions[paragraph_number] = paragraph_decisions
+    return decisions
+
+# Writes the changes to the paragraphs of a built history as tab-separated
+# values, in order of decision: date, meeting, version, L2 references, and the
+# numbers of the paragraphs that the issue changed.
+def write_change_log(timeline: IssueTimeline, history: SequenceHistory, f: TextIO):
+  paragraphs : dict[Issue, list[ParagraphNumber]] = {}
+  for paragraph_number, decisions in timeline.paragraph_decisions(history).items():
+    for _, _, issue in decisions:
+      paragraphs.setdefault(issue, []).append(paragraph_number)
+  print("date\tmeeting\tversion\tl2_refs\tparagraphs", file=f)
+  for issue in timeline.by_date():
+    number, date = timeline.decision(issue)
+    print(f"{date.isoformat()}\tUTC #{number}\t{issue.version}\t{', '.join(issue.l2_refs)}\t"
+          f"{' '.join(str(p) for p in paragraphs.get(issue, []))}", file=f)
@@ -1,26 +1,60 @@
-﻿import csv
-import datetime
-from difflib import SequenceMatcher
+﻿import datetime
+import html
+import io
+import json
+import os
 from typing import Sequence, Tuple
 import re
+import sys
 
 from annotations import ISSUES
-from document import Paragraph, Heading, Rule, Formula, TableRow, CodeLine
+from document import Paragraph, Heading, Rule, Formula, TableRow, CodeLine, is_default_junk, get_granularity
 from historical_diff import Version, ParagraphNumber, SequenceHistory, AtomHistory
 import historical_diff
+from history_db import write_sqlite
+from history_jsonl import write_jsonl
+from issue_timeline import IssueTimeline, write_change_log
+from move_detection import detect_moves, format_ancestries
+from moved_phrases import find_moved_phrases
+from phase_timings import DiffTelemetry, PhaseTimings
+from rule_history import build_rule_histories, print_rule_history, write_rule_history_json
+from rule_renumbering import RenumberingIndex, read_renumberings
+from search_index import write_search_index
+from similarity import SimilarityIndex
+from static_views import StaticViewCache, static_view_file
+from term_provenance import TermIndex
+from unexplained_changes import print_unexplained_changes, unexplained_changes, write_unexplained_changes
+from visibility import VisibilityIndex, write_visibility
 
 SECTION_6 = 361
 
+args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+
+# With --timings=timings.json or --profile=lb_differ.prof, the time taken by
+# each phase is reported; with --memory=, so is the memory used, and the number
+# of live histories, paragraph numbers, and versions (tracing allocations makes
+# the run more than ten times slower); see phase_timings.py.
+timings = PhaseTimings()
+# With --diff-telemetry=diffs.json (or --diff-telemetry= to only print the
+# summary), the cost of each paragraph diff is recorded, and the most expensive
+# ones are reported; see phase_timings.DiffTelemetry.
+diff_telemetry = DiffTelemetry() if "diff-telemetry" in args else None
+# With --diff-budget=N, paragraphs whose old and new token counts have a product
+# above N are diffed by sentences, or replaced wholesale; these coarse diffs,
+# and the tokens ignored by difflib's autojunk heuristic, are logged as DIFF:.
+# --diff-budget= only logs autojunk.
+diff_budget = int(args["diff-budget"]) if args.get("diff-budget") else None
+
+def log_diff(version: Version, message: str, *context):
+  print("DIFF:", *context, "in", version, message)
+
 def parse_version(s):
   match = re.match(r"(?:Unicode )?(\d+)\.(\d)\.(\d)", s)
   if match:
     return Version(*(int(v) for v in match.groups()))
 
-with open('renumberings.tsv') as f:
-  rows = csv.reader(f, delimiter="\t")
-  columns = [tuple(re.sub(r"LB|deprecated|removed", "", entry).strip() or None for entry in column) for column in zip(*rows)]
-  TABLE_5_BY_COLUMNS = {parse_version(column[0]) : tuple(column[1:]) for column in columns}
-  RENUMBERINGS = {parse_version(left[0]) : tuple(zip(left[1:], right[1:])) for left, right in zip(columns[:-1], columns[1:])}
+TABLE_5_BY_COLUMNS, RENUMBERINGS = read_renumberings()
+RENUMBERING_INDEX = RenumberingIndex(TABLE_5_BY_COLUMNS, RENUMBERINGS)
 
 splits = set()
 creations = set()
@@ -31,47 +65,48 @@ REORDERINGS = {
   Version(5, 0, 0): [("11b", "11"), ("13", "12")]
 }
 
-for version, renumbering in reversed(list(RENUMBERINGS.items())):
-  mapping = dict(renumbering)
-  reverse = {}
-  for new, old in renumbering:
-    if old:
-      if new:
-        reverse.setdefault(old, set()).add(new)
+def analyse_renumberings():
+  for version, renumbering in reversed(list(RENUMBERINGS.items())):
+    mapping = dict(renumbering)
+    reverse = {}
+    for new, old in renumbering:
+      if old:
+        if new:
+          reverse.setdefault(old, set()).add(new)
+        else:
+          deletions.add((version, old))
+          print (f"RULE DELETION: {old} in {version}")
+      elif new:
+        creations.add((version, new))
+        print (f"RULE CREATION: {new} in {version}")
+
+    for old, new in reverse.items():
+      if len(new) > 1:
+        for n in new:
+          splits.add((version, n))
+        print (f"RULE SPLIT: {old} into ({', '.join(sorted(new))}) in {version}")
+
+    common = [(old, tuple(new)[0]) for old, new, in reverse.items() if len(new) == 1]
+    old_order = sorted(common, key=lambda x: re.sub(r"^(\d)(?!\d)", r"0\1", x[0]))
+    new_order = sorted(common, key=lambda x: re.sub(r"^(\d)(?!\d)", r"0\1", x[1]))
+    if new_order != old_order:
+      print("REORDERING in", version)
+      for i in range(len(old_order)):
+        if new_order[i] != old_order[i]:
+          break
+      for j in range(len(old_order)):
+        if new_order[-j] != old_order[-j]:
+          break
+      print("...", " ".join(old + "↦" + new for old, new in old_order[i:-j+1]), "...")
+      print("...", " ".join(old + "↦" + new for old, new in new_order[i:-j+1]), "...")
+      if version in REORDERINGS:
+        for old, new in REORDERINGS[version]:
+          old_order.remove((old, new))
+          new_order.remove((old, new))
+        if old_order != new_order:
+          print("INCORRECTLY DESCRIBED")
       else:
-        deletions.add((version, old))
-        print (f"RULE DELETION: {old} in {version}")
-    elif new:
-      creations.add((version, new))
-      print (f"RULE CREATION: {new} in {version}")
-
-  for old, new in reverse.items():
-    if len(new) > 1:
-      for n in new:
-        splits.add((version, n))
-      print (f"RULE SPLIT: {old} into ({', '.join(sorted(new))}) in {version}")
-
-  common = [(old, tuple(new)[0]) for old, new, in reverse.items() if len(new) == 1]
-  old_order = sorted(common, key=lambda x: re.sub(r"^(\d)(?!\d)", r"0\1", x[0]))
-  new_order = sorted(common, key=lambda x: re.sub(r"^(\d)(?!\d)", r"0\1", x[1]))
-  if new_order != old_order:
-    print("REORDERING in", version)
-    for i in range(len(old_order)):
-      if new_order[i] != old_order[i]:
-        break
-    for j in range(len(old_order)):
-      if new_order[-j] != old_order[-j]:
-        break
-    print("...", " ".join(old + "↦" + new for old, new in old_order[i:-j+1]), "...")
-    print("...", " ".join(old + "↦" + new for old, new in new_order[i:-j+1]), "...")
-    if version in REORDERINGS:
-      for old, new in REORDERINGS[version]:
-        old_order.remove((old, new))
-        new_order.remove((old, new))
-      if old_order != new_order:
-        print("INCORRECTLY DESCRIBED")
-    else:
-      print("UNEXPECTED")
+        print("UNEXPECTED")
 
 METAMORPHOSES = {
   Version(4, 1, 0): [(Paragraph, ParagraphNumber(SECTION_6 + 84), Formula)],
@@ -101,8 +136,11 @@ METAMORPHOSES = {
                      (Paragraph, ParagraphNumber(506), TableRow),],
 }
 
-with open("paragraphs.py", encoding="utf-8") as f:
-  VERSIONS : dict[Version, Sequence[Paragraph]] = eval(f.read())
+VERSIONS : dict[Version, Sequence[Paragraph]] = {}
+
+def load_versions(path="paragraphs.py"):
+  with open(path, encoding="utf-8") as f:
+    VERSIONS.update(eval(f.read()))
 
 def get_ancestor(version: Version, p: ParagraphNumber):
   if version in ANCESTRIES and p in ANCESTRIES[version]:
@@ -112,9 +150,6 @@ def get_ancestor(version: Version, p: ParagraphNumber):
   else:
     return None
 
-def is_default_junk(w):
-  return w.isspace() or w in ".,;:" or w in ("of", "and", "between", "the", "is", "that", "ing")
-
 def get_junk_override(version: Version, p: ParagraphNumber):
   if version in JUNK and p in JUNK[version]:
     junk = JUNK[version][p]
@@ -139,12 +174,17 @@ def make_sequence_history(v, p: Paragraph, *context):
         junk=is_default_junk,
         check_and_get_elements=get_words,
         get_ancestor=get_ancestor,
-        get_junk_override=get_junk_override)
+        get_junk_override=get_junk_override,
+        record_diff=diff_telemetry.record if diff_telemetry else None,
+        diff_budget=diff_budget,
+        log_diff=log_diff if "diff-budget" in args else None,
+        get_granularity=get_granularity)
   h.tag = p
   h.add_version(v, p, *context)
   return h
 
-history = SequenceHistory(element_history=make_sequence_history, number_nicely=True)
+history = SequenceHistory(element_history=make_sequence_history, number_nicely=True,
+                          record_diff=diff_telemetry.record if diff_telemetry else None)
 
 DELETED_PARAGRAPHS = {
   Version(3, 1, 0): [
@@ -700,69 +740,105 @@ JUNK = {
 
 nontrivial_versions = []
 
-additional_paragraphs = {}
+# The issues of each version that list each paragraph, in the order of ISSUES.
+ISSUES_BY_PARAGRAPH : dict[Tuple[Version, ParagraphNumber], list] = {}
+for issue in ISSUES:
+  for paragraph_number in issue.paragraphs:
+    issues = ISSUES_BY_PARAGRAPH.setdefault((issue.version, paragraph_number), [])
+    if issue not in issues:
+      issues.append(issue)
+
+# The dates of the decisions on the issues, shown in the sources.
+ISSUE_TIMELINE = IssueTimeline(ISSUES)
+
+# With --moved-phrases=, phrases moved within a paragraph are detected after
+# each version, logged as MOVED PHRASE, and marked as moved in alba.html.
+
+# With --detect-moves=, the paragraphs inserted in each version that seem to
+# have been moved or split from text deleted in that version, and are not in
+# ANCESTRIES, are printed as an entry of ANCESTRIES, ready to be pasted; with
+# --detect-moves=apply, they are also added to ANCESTRIES, and their histories
+# rebuilt from their ancestors.
+def detect_version_moves(version: Version, apply=False):
+  deleted = []
+  inserted = []
+  for paragraph_number, paragraph in history.elements:
+    removed_text = "".join(c.text for _, c in paragraph.elements if c.removed == version)
+    if removed_text.strip():
+      deleted.append((paragraph_number, removed_text))
+    elif paragraph.version_added() == version and not paragraph.ancestor:
+      inserted.append((paragraph_number, paragraph.value()))
+  proposals = detect_moves(deleted, inserted)
+  if not proposals:
+    return
+  print("MOVES in", version)
+  print(format_ancestries(version, proposals))
+  if apply:
+    indices = {paragraph_number: i for i, (paragraph_number, _) in enumerate(history.elements)}
+    for inserted_number, deleted_number, _ in proposals:
+      ANCESTRIES.setdefault(version, {})[inserted_number] = deleted_number
+      i = indices[inserted_number]
+      history.elements[i] = (inserted_number,
+                             make_sequence_history(version, history.elements[i][1].tag, inserted_number))
 
-previous_version = None
-for version, paragraphs in list(VERSIONS.items()):
+def apply_version(version: Version, paragraphs: Sequence[Paragraph]):
   print(version)
 
   old_paragraphs = dict(history.elements)
   for paragraph_number in DELETED_PARAGRAPHS.get(version, []):
     print("Deleting", paragraph_number, "in", version)
     old_paragraphs[paragraph_number].remove(version, paragraph_number)
-  for paragraph_number, hint in PRESERVED_PARAGRAPHS.get(version, {}).items():
-    print("Preserving", paragraph_number, "in", version)
-    expected_type = type(old_paragraphs[paragraph_number].tag)
-    if version in METAMORPHOSES:
-      for old_type, number, new_type in METAMORPHOSES[version]:
-        if expected_type == old_type and number == paragraph_number:
-          expected_type = new_type
-    old_paragraph = old_paragraphs[paragraph_number].value()
-    hinted_paragraphs = [
-        p for p in paragraphs
-        if type(p) == expected_type and p.contents.startswith(hint)] if hint else [
-        p for p in paragraphs
-        if type(p) == expected_type]
-    if not hinted_paragraphs:
-      print("ERROR: no paragraph matching hint", hint)
-    new_paragraph = max(hinted_paragraphs, key = lambda p: SequenceMatcher(None, p.contents, old_paragraph).ratio())
-    old_paragraphs[paragraph_number].add_version(version, new_paragraph, paragraph_number)
-
-  history.add_version(version, paragraphs)
-
-  any_change = False
-  rule_number = None
-  rule_issues = []
-  for paragraph_number, paragraph in history.elements:
-    paragraph_issues = [issue for issue in ISSUES
-                        if issue.version == version and paragraph_number in issue.paragraphs]
-    rule_number = None
-    previous_rule_number = None
-
-    if paragraph.last_changed() == version:
-      any_change = True
-      for issue in rule_issues:
-        additional_paragraphs.setdefault(issue, []).append(paragraph_number)
-      paragraph.references += paragraph_issues + rule_issues
+  with timings.phase("preserved_paragraphs", str(version)):
+    similarity_index = SimilarityIndex(paragraphs)
+    for paragraph_number, hint in PRESERVED_PARAGRAPHS.get(version, {}).items():
+      print("Preserving", paragraph_number, "in", version)
+      expected_type = type(old_paragraphs[paragraph_number].tag)
+      if version in METAMORPHOSES:
+        for old_type, number, new_type in METAMORPHOSES[version]:
+          if expected_type == old_type and number == paragraph_number:
+            expected_type = new_type
+      old_paragraph = old_paragraphs[paragraph_number].value()
+      hinted_paragraphs = similarity_index.candidates(expected_type, hint or "")
+      if not hinted_paragraphs:
+        print("ERROR: no paragraph matching hint", hint)
+      new_paragraph = similarity_index.most_similar(hinted_paragraphs, old_paragraph)
+      old_paragraphs[paragraph_number].add_version(version, new_paragraph, paragraph_number)
+
+  with timings.phase("add_version", str(version)):
+    history.add_version(version, paragraphs)
+
+  if "moved-phrases" in args:
+    with timings.phase("moved_phrases", str(version)):
+      for paragraph_number, paragraph in history.elements:
+        if paragraph.last_changed() == version:
+          for phrase in find_moved_phrases(paragraph, version):
+            print("MOVED PHRASE in", paragraph_number, "in", f"{version}:", phrase)
+
+  if "detect-moves" in args:
+    with timings.phase("detect_moves", str(version)):
+      detect_version_moves(version, apply=args["detect-moves"] == "apply")
+
+  with timings.phase("references", str(version)):
+    any_change = False
+    for paragraph_number, paragraph in history.elements:
+      if paragraph.last_changed() == version:
+        any_change = True
+        paragraph.references += ISSUES_BY_PARAGRAPH.get((version, paragraph_number), [])
   if any_change:
       nontrivial_versions.append(version)
-  previous_version = version
 
-for issue, paragraphs in sorted(additional_paragraphs.items(), key=lambda x: -x[0].source_line):
-  print(issue)
-  print(str(paragraphs).replace("), ", "),\n    ").replace("[", "paragraphs=[\n    ").replace("]", ",\n]"))
-
-for issue in ISSUES:
-  for annotation in issue.annotations:
-    print("adding annotation %s" % annotation.number)
-    for i, (paragraph_number, paragraph) in enumerate(history.elements):
-      if annotation.number < paragraph_number:
-        break
-    annotation_history = make_sequence_history(issue.version, annotation, annotation.number)
-    history.elements.insert(i,
-                            (annotation.number,
-                             annotation_history))
-    annotation_history.references = [issue]
+def insert_annotations():
+  for issue in ISSUES:
+    for annotation in issue.annotations:
+      print("adding annotation %s" % annotation.number)
+      for i, (paragraph_number, paragraph) in enumerate(history.elements):
+        if annotation.number < paragraph_number:
+          break
+      annotation_history = make_sequence_history(issue.version, annotation, annotation.number)
+      history.elements.insert(i,
+                              (annotation.number,
+                               annotation_history))
+      annotation_history.references = [issue]
 
 
 TOL_LIGHT_COLOURS = [
@@ -798,12 +874,12 @@ def pri_link(pri_reference : str):
   document = head if head.startswith("L2") else "PRI-" + head
   return f'<a href="{url}">{document}#{id}</a>'
 
-with open("alba.html", "w", encoding="utf-8") as f:
+def print_head(f, title="Annotated Line Breaking Algorithm", body_attributes="", script=True):
   print("<!DOCTYPE html>", file=f)
   print("<html>", file=f)
   print("<head>", file=f)
   print('<meta charset="utf-8">', file=f)
-  print("<title>Annotated Line Breaking Algorithm</title>", file=f)
+  print(f"<title>{title}</title>", file=f)
   print("<style>", file=f)
   for i, version in enumerate(nontrivial_versions):
     colour = TOL_LIGHT_COLOURS[i % len(TOL_LIGHT_COLOURS)]
@@ -826,12 +902,15 @@ with open("alba.html", "w", encoding="utf-8") as f:
   with open("alba.css") as css:
     print(css.read(), file=f)
   print("</style>", file=f)
-  print("<script>", file=f)
-  with open("alba.js") as js:
-    print(js.read(), file=f)
-  print("</script>", file=f)
+  if script:
+    print("<script>", file=f)
+    with open("alba.js") as js:
+      print(js.read(), file=f)
+    print("</script>", file=f)
   print("</head>", file=f)
-  print('<body lang="en-US">', file=f)
+  print(f'<body lang="en-US"{body_attributes}>', file=f)
+
+def print_nav(f):
   print('<nav>', file=f)
   print('<table>', file=f)
   print("<thead><tr><th>Base</th><th>Head</th></tr></thead>", file=f)
@@ -849,51 +928,253 @@ with open("alba.html", "w", encoding="utf-8") as f:
   print("</table>", file=f)
   print('<div><input type="checkbox" name="show-deleted" id="show-deleted">', file=f)
   print('<label for="show-deleted">Show deleted paragraphs</label></div>', file=f)
+  if "search-index" in args:
+    print('<div><input type="search" id="search" placeholder="Search"></div>', file=f)
+    print('<ol id="search-results"></ol>', file=f)
+  if "static" in args:
+    print('<div><a id="static-view" hidden>Static view of these changes</a></div>', file=f)
   print('</nav>', file=f)
-  for paragraph_number, paragraph in history.elements:
-    paragraph: SequenceHistory
-    revision_number = ""
-    versions_changed = paragraph.versions_changed()
-    version_added = paragraph.version_added()
-    last_changed = paragraph.last_changed()
-
-    # Unexplained changes.
-    # TODO(egg): Move the printing out of the loop, gather for all versions,
-    # print an explanatory line above.
-    if Version(16, 0, 0) in versions_changed and not any(issue.version == Version(16, 0, 0) for issue in paragraph.references):
-      print("              %r," % paragraph_number)
-
-    print(f'<div class="paragraph added-in-{version_added.html_class()}{(" removed-in-" + last_changed.html_class()) if paragraph.absent() else ""}">', file=f)
-    for new, old in zip(versions_changed[1:], versions_changed[:-1]):
-      if old == Version(3, 0, 0):
-        continue
-      revision_number += f'<del class="paranum changed-in-{new.html_class()}"><ins class="paranum changed-in-{old.html_class()}">/{old.short()}</ins></del>'
-    if versions_changed[-1] != Version(3, 0, 0):
-      revision_number += f'<ins class="paranum changed-in-{last_changed.html_class()}">/{last_changed.short()}</ins>'
-    print(f"<div class=paranum><a id=p{paragraph_number} href=#p{paragraph_number}>{paragraph_number}{revision_number}</a></div>", file=f)
-
-    if paragraph.references:
-      print("<div class=sources>", file=f)
-    for issue in paragraph.references:
-      print(f'<ins class="changed-in-{issue.version.html_class()} sources">', file=f)
-      print("{" + str(issue.version) + ": " +
-            "; ".join(
-              (part for part in (
-                ", ".join(f'<a href="https://www.unicode.org/cgi-bin/GetL2Ref.pl?{l2ref}">{l2ref}</a>'
-                          for l2ref in issue.l2_refs),
-                ",".join(f'<a href="https://www.unicode.org/cgi-bin/GetMatchingDocs.pl?{l2doc}">{l2doc}</a>'
-                          for l2doc in issue.l2_docs),
-                ",".join(pri_link(pri) for pri in issue.pri))
-                if part)) +
-            "}",
-            file=f)
-      print('</ins>', file=f)
-    if paragraph.references:
-      print("</div>", file=f)
-    if paragraph_number in (ParagraphNumber(1), ParagraphNumber(2)):
-      print(paragraph.tag.html("Annotated " + paragraph.html(), paragraph.version_added()), file=f)
-    else:
-      print(paragraph.tag.html(paragraph.html(), paragraph.version_added()), file=f)
+
+# The attributes of the body of the pages with a navigation bar, relative to
+# the given directory.
+def body_attributes(directory="."):
+  attributes = ""
+  if "search-index" in args:
+    index = os.path.relpath(args["search-index"], directory).replace(os.sep, "/")
+    attributes += f' data-search-index="{index}/"'
+  if "static" in args:
+    views = os.path.relpath(args["static"], directory).replace(os.sep, "/")
+    pairs = " ".join(f"{base}-{head}" for base, head in static_pairs())
+    attributes += f' data-static-views="{views}/" data-static-pairs="{pairs}"'
+  return attributes
+
+def print_paragraph(paragraph_number: ParagraphNumber, paragraph: SequenceHistory, f):
+  revision_number = ""
+  versions_changed = paragraph.versions_changed()
+  version_added = paragraph.version_added()
+  last_changed = paragraph.last_changed()
+
+  print(f'<div class="paragraph added-in-{version_added.html_class()}{(" removed-in-" + last_changed.html_class()) if paragraph.absent() else ""}">', file=f)
+  for new, old in zip(versions_changed[1:], versions_changed[:-1]):
+    if old == Version(3, 0, 0):
+      continue
+    revision_number += f'<del class="paranum changed-in-{new.html_class()}"><ins class="paranum changed-in-{old.html_class()}">/{old.short()}</ins></del>'
+  if versions_changed[-1] != Version(3, 0, 0):
+    revision_number += f'<ins class="paranum changed-in-{last_changed.html_class()}">/{last_changed.short()}</ins>'
+  print(f"<div class=paranum><a id=p{paragraph_number} href=#p{paragraph_number}>{paragraph_number}{revision_number}</a></div>", file=f)
+
+  if paragraph.references:
+    print("<div class=sources>", file=f)
+  for issue in paragraph.references:
+    print(f'<ins class="changed-in-{issue.version.html_class()} sources">', file=f)
+    decision = ISSUE_TIMELINE.decision(issue)
+    decided = f', <time datetime={decision[1].isoformat()}>{decision[1].isoformat()}</time>' if decision else ""
+    print("{" + str(issue.version) + decided + ": " +
+          "; ".join(
+            (part for part in (
+              ", ".join(f'<a href="https://www.unicode.org/cgi-bin/GetL2Ref.pl?{l2ref}">{l2ref}</a>'
+                        for l2ref in issue.l2_refs),
+              ",".join(f'<a href="https://www.unicode.org/cgi-bin/GetMatchingDocs.pl?{l2doc}">{l2doc}</a>'
+                        for l2doc in issue.l2_docs),
+              ",".join(pri_link(pri) for pri in issue.pri))
+              if part)) +
+          "}",
+          file=f)
+    print('</ins>', file=f)
+  if paragraph.references:
     print("</div>", file=f)
-  print("</body>", file=f)
-  print("</html>", file=f)
+  if paragraph_number in (ParagraphNumber(1), ParagraphNumber(2)):
+    print(paragraph.tag.html("Annotated " + paragraph.html(), paragraph.version_added()), file=f)
+  else:
+    print(paragraph.tag.html(paragraph.html(), paragraph.version_added()), file=f)
+  print("</div>", file=f)
+
+# The markup of each paragraph of history.elements, rendered once and shared by
+# all outputs.
+paragraph_markup : list[str] = []
+
+def write_alba(path="alba.html"):
+  with open(path, "w", encoding="utf-8") as f:
+    print_head(f, body_attributes=body_attributes())
+    print_nav(f)
+    for paragraph_number, paragraph in history.elements:
+      markup = io.StringIO()
+      print_paragraph(paragraph_number, paragraph, markup)
+      paragraph_markup.append(markup.getvalue())
+      print(paragraph_markup[-1], end="", file=f)
+    print("</body>", file=f)
+    print("</html>", file=f)
+
+# Headings at this level or above start a new fragment in the split output.
+FRAGMENT_HEADING_LEVEL = 3
+
+# Groups the paragraphs of the history into sections keyed by the number of the
+# heading that starts them, as (key, level, parents, heading, paragraphs),
+# where parents are the keys of the enclosing sections, and paragraphs are
+# (index in history.elements, paragraph number) pairs.
+def get_fragments():
+  fragments = [("front", 0, [], "", [])]
+  enclosing : list[Tuple[int, str]] = []
+  for i, (paragraph_number, paragraph) in enumerate(history.elements):
+    if isinstance(paragraph.tag, Heading) and paragraph.tag.level <= FRAGMENT_HEADING_LEVEL:
+      while enclosing and enclosing[-1][0] >= paragraph.tag.level:
+        enclosing.pop()
+      key = str(paragraph_number)
+      fragments.append((key, paragraph.tag.level, [k for _, k in enclosing],
+                        paragraph.value() or paragraph.value_at(paragraph.last_changed()), []))
+      enclosing.append((paragraph.tag.level, key))
+    fragments[-1][4].append((i, paragraph_number))
+  return [fragment for fragment in fragments if fragment[4]]
+
+# Writes a light shell, directory/index.html, with a placeholder for each
+# section, the sections themselves as directory/<key>.html, and
+# directory/manifest.json, which maps paragraph numbers to section keys; alba.js
+# fetches the sections as they are scrolled into view or targeted by an anchor.
+def write_split(directory):
+  os.makedirs(directory, exist_ok=True)
+  fragments = get_fragments()
+  manifest = {
+    "fragments": [{"key": key, "file": f"{key}.html", "level": level, "parents": parents,
+                   "paragraphs": len(paragraphs)}
+                  for key, level, parents, _, paragraphs in fragments],
+    "paragraphs": {str(paragraph_number): key
+                   for key, _, _, _, paragraphs in fragments
+                   for _, paragraph_number in paragraphs},
+  }
+  with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+    json.dump(manifest, f, ensure_ascii=False)
+  for key, _, _, _, paragraphs in fragments:
+    with open(os.path.join(directory, f"{key}.html"), "w", encoding="utf-8") as f:
+      for i, _ in paragraphs:
+        print(paragraph_markup[i], end="", file=f)
+  with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as f:
+    print_head(f, body_attributes=' data-manifest="manifest.json"' + body_attributes(directory))
+    print_nav(f)
+    for key, level, _, heading, paragraphs in fragments:
+      print(f'<section id="fragment-{key}" data-fragment="{key}.html" style="min-height:{2 * len(paragraphs)}em">', file=f)
+      if heading:
+        print(f'<h{level} class=placeholder>{html.escape(heading)}</h{level}>', file=f)
+      print("</section>", file=f)
+    print("</body>", file=f)
+    print("</html>", file=f)
+
+# The pairs for which show_version_diff would be called: each nontrivial
+# version against its predecessor.
+def predecessor_pairs():
+  return ([(nontrivial_versions[0], nontrivial_versions[0])] +
+          list(zip(nontrivial_versions[:-1], nontrivial_versions[1:])))
+
+def all_pairs():
+  return [(base, head) for i, head in enumerate(nontrivial_versions)
+                       for base in nontrivial_versions[:i + 1]]
+
+# The pairs for which write_static_views writes a page.
+def static_pairs():
+  return all_pairs() if args.get("static-pairs") == "all" else predecessor_pairs()
+
+def print_static_nav(f, base: Version, head: Version):
+  print('<nav>', file=f)
+  print('<table>', file=f)
+  print("<tbody>", file=f)
+  for old, new in predecessor_pairs():
+    style = "" if new == head else ' style="color:black;background:white;"'
+    print(f'<tr><td><a class="changed-in-{new.html_class()}"{style} href="{static_view_file(old, new)}">Unicode Version {new}</a></td></tr>', file=f)
+  print("</tbody>", file=f)
+  print("</table>", file=f)
+  print(f"<div>Changes from {base} to {head}</div>", file=f)
+  print('</nav>', file=f)
+
+# Writes one page per (base, head) pair, resolved as meow() would resolve it,
+# without the deleted paragraphs, and with no script.
+def write_static_views(directory, pairs):
+  os.makedirs(directory, exist_ok=True)
+  cache = StaticViewCache()
+  for i, (_, paragraph) in enumerate(history.elements):
+    cache.add(i, paragraph_markup[i], paragraph)
+  visibility = VisibilityIndex(history, list(VERSIONS))
+  for base, head in pairs:
+    with open(os.path.join(directory, static_view_file(base, head)), "w", encoding="utf-8") as f:
+      print_head(f, title=f"Annotated Line Breaking Algorithm, changes from {base} to {head}",
+                 body_attributes=" class=static", script=False)
+      print_static_nav(f, base, head)
+      for i in visibility.visible_paragraphs(base, head):
+        print(cache.get(i, base, head), end="", file=f)
+      print("</body>", file=f)
+      print("</html>", file=f)
+  print(f"{len(pairs)} static views, {cache.misses} paragraph views rendered, {cache.hits} reused")
+
+# Writes the history of each rule, as directory/rules.json and
+# directory/rules.html; see rule_history.py.
+def write_rule_history(directory):
+  os.makedirs(directory, exist_ok=True)
+  rules = build_rule_histories(history, list(VERSIONS), RENUMBERING_INDEX)
+  write_rule_history_json(rules, os.path.join(directory, "rules.json"))
+  with open(os.path.join(directory, "rules.html"), "w", encoding="utf-8") as f:
+    print_head(f, title="History of the line breaking rules", script=False)
+    print_rule_history(rules, f, os.path.relpath("alba.html", directory).replace(os.sep, "/"), pri_link)
+    print("</body>", file=f)
+    print("</html>", file=f)
+
+if __name__ == "__main__":
+  if "profile" in args:
+    timings.start_profile()
+  if "memory" in args:
+    timings.start_memory((AtomHistory, SequenceHistory, ParagraphNumber, Version))
+  with timings.phase("renumberings"):
+    analyse_renumberings()
+  with timings.phase("load_versions"):
+    load_versions()
+  for version, paragraphs in VERSIONS.items():
+    with timings.phase("version", str(version)):
+      apply_version(version, paragraphs)
+  with timings.phase("annotations"):
+    insert_annotations()
+  with timings.phase("render"):
+    write_alba()
+  # Unexplained changes: their number in each version, and the paragraphs
+  # changed in the latest version (or in the version given by
+  # --unexplained-in=15.1.0, or in all versions with --unexplained-in=all); with
+  # --unexplained=unexplained.json, all of them are also written as JSON.  See
+  # unexplained_changes.py.
+  with timings.phase("unexplained"):
+    report = unexplained_changes(history, list(VERSIONS))
+    if args.get("unexplained-in") == "all":
+      paste_versions = list(report)
+    elif args.get("unexplained-in"):
+      paste_versions = [parse_version(args["unexplained-in"])]
+    else:
+      paste_versions = [max(VERSIONS)]
+    print_unexplained_changes(report, paste_versions)
+    if args.get("unexplained"):
+      write_unexplained_changes(report, args["unexplained"])
+  if "split" in args:
+    with timings.phase("split"):
+      write_split(args["split"])
+  if "static" in args:
+    with timings.phase("static"):
+      write_static_views(args["static"], static_pairs())
+  if "change-log" in args:
+    with timings.phase("change_log"), open(args["change-log"], "w", encoding="utf-8") as f:
+      write_change_log(ISSUE_TIMELINE, history, f)
+  if "rule-history" in args:
+    with timings.phase("rule_history"):
+      write_rule_history(args["rule-history"])
+  if "search-index" in args:
+    with timings.phase("search_index"):
+      write_search_index(history, nontrivial_versions, args["search-index"])
+  if "jsonl" in args:
+    with timings.phase("jsonl"), open(args["jsonl"], "w", encoding="utf-8") as f:
+      write_jsonl(history, f)
+  if "term-index" in args:
+    with timings.phase("term_index"):
+      TermIndex.from_history(history).write(args["term-index"])
+  if "visibility" in args:
+    with timings.phase("visibility"):
+      write_visibility(VisibilityIndex(history, list(VERSIONS)), args["visibility"])
+  if "sqlite" in args:
+    with timings.phase("sqlite"):
+      write_sqlite(history, list(VERSIONS), args["sqlite"])
+  if "timings" in args or "profile" in args or "memory" in args:
+    timings.write(args.get("timings"), args.get("profile"), int(args.get("top", "10")))
+  if diff_telemetry:
+    diff_telemetry.write(args["diff-telemetry"] or None, int(args.get("top", "10")))
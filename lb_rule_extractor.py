@@ -2,6 +2,7 @@
 from typing import List, Tuple
 from historical_diff import Version
 from document import Paragraph, Heading, Rule, Formula, TableRow, CodeLine
+from phase_timings import PhaseTimings
 import glob
 import html
 from html.parser import HTMLParser
@@ -182,21 +183,36 @@ class TR14Parser(HTMLParser):
 
 
 
-paragraphs = {}
-
-for revision, filename in sorted(revisions.items()):
-  print(filename)
+def parse_revision(revision, filename):
   with open(filename, encoding=('cp1252' if revision < 10 else'utf-8')) as f:
     parser = TR14Parser(Version(3,0,0) if revision == 6 else
                         Version(16, 0, 0) if revision == 52 else
                         None)
     parser.feed(f.read())
+  return parser
+
+if __name__ == "__main__":
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  # With --timings=timings.json or --profile=lb_rule_extractor.prof, the time
+  # taken to parse each revision is reported; see phase_timings.py.
+  timings = PhaseTimings()
+  if "profile" in args:
+    timings.start_profile()
+  paragraphs = {}
+
+  for revision, filename in sorted(revisions.items()):
+    print(filename)
+    with timings.phase("parse", filename):
+      parser = parse_revision(revision, filename)
     paragraphs[parser.version] = parser.paragraphs
     print(f"Unicode Version {parser.version}, {len(parser.paragraphs)} paragraphs")
 
-args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
-if "out" in args:
-  f = open(args["out"], "w", encoding="utf-8")
-else:
-  f = sys.stdout
-pprint.PrettyPrinter(sort_dicts=False, stream=f).pprint(paragraphs)
+  if "out" in args:
+    f = open(args["out"], "w", encoding="utf-8")
+  else:
+    f = sys.stdout
+  with timings.phase("write"):
+    pprint.PrettyPrinter(sort_dicts=False, stream=f).pprint(paragraphs)
+  if "timings" in args or "profile" in args:
+    f.flush()
+    timings.write(args.get("timings"), args.get("profile"), int(args.get("top", "10")))
@@ -0,0 +1,73 @@
+import random
+from typing import Sequence, Tuple
+import zlib
+
+from historical_diff import Version, ParagraphNumber
+from segmentation import split_words
+
+# Detection of paragraphs that were moved or split in a version, and should
+# therefore be listed in lb_differ.ANCESTRIES, among the paragraphs deleted
+# and inserted in that version.
+# Each paragraph is reduced to its set of shingles, runs of SHINGLE_SIZE
+# consecutive words, and to a MinHash signature of HASHES hashes of that set.
+# Locality-sensitive hashing over BANDS bands of the signature yields the pairs
+# of inserted and deleted paragraphs that share a band, which are likely to
+# have similar sets of shingles; only for those is the exact containment of
+# the shingles of the inserted paragraph in those of the deleted paragraph
+# computed.  Since the bands are short, the pieces of a split paragraph, whose
+# shingles are a small part of those of the original, are usually found.
+
+SHINGLE_SIZE = 3
+HASHES = 32
+BANDS = 16
+ROWS = HASHES // BANDS
+# Inserted paragraphs whose shingles are at least this much contained in
+# those of a deleted paragraph are proposed as moved or split from it.
+MINIMUM_CONTAINMENT = 0.5
+
+PRIME = (1 << 61) - 1
+_random = random.Random(14)
+COEFFICIENTS = [(_random.randrange(1, PRIME), _random.randrange(PRIME)) for _ in range(HASHES)]
+
+def shingles(text: str) -> set[int]:
+  words = [w for w in split_words(text) if not w.isspace()]
+  return {zlib.crc32("\0".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+          for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+def signature(shingle_set: set[int]) -> Tuple[int, ...]:
+  return tuple(min((a * s + b) % PRIME for s in shingle_set) for a, b in COEFFICIENTS)
+
+# Returns (inserted number, deleted number, containment) for each inserted
+# paragraph that is likely to have been moved or split from a deleted one, with
+# the deleted paragraph that contains it best.
+def detect_moves(deleted: Sequence[Tuple[ParagraphNumber, str]],
+                 inserted: Sequence[Tuple[ParagraphNumber, str]]):
+  deleted_shingles = [shingles(text) for _, text in deleted]
+  buckets : dict[Tuple[int, Tuple[int, ...]], list[int]] = {}
+  for j, shingle_set in enumerate(deleted_shingles):
+    s = signature(shingle_set)
+    for band in range(BANDS):
+      buckets.setdefault((band, s[band * ROWS:(band + 1) * ROWS]), []).append(j)
+  proposals = []
+  for number, text in inserted:
+    shingle_set = shingles(text)
+    s = signature(shingle_set)
+    candidates = set()
+    for band in range(BANDS):
+      candidates.update(buckets.get((band, s[band * ROWS:(band + 1) * ROWS]), ()))
+    best = None
+    for j in sorted(candidates):
+      containment = len(shingle_set & deleted_shingles[j]) / len(shingle_set)
+      if containment >= MINIMUM_CONTAINMENT and (not best or containment > best[1]):
+        best = (j, containment)
+    if best:
+      proposals.append((number, deleted[best[0]][0], best[1]))
+  return proposals
+
+# The proposals as an entry of lb_differ.ANCESTRIES.
+def format_ancestries(version: Version, proposals):
+  lines = [f"  {version!r}: {{"]
+  for inserted, deleted, containment in proposals:
+    lines.append(f"    {inserted!r}: {deleted!r},  # {containment:.0%}")
+  lines.append("  },")
+  return "\n".join(lines)
@@ -0,0 +1,76 @@
+from historical_diff import Version, SequenceHistory
+
+# Detection of phrases moved within a paragraph in a given version, that is,
+# of runs of tokens removed in that version that occur again among the tokens
+# added in that version.  The runs of removed tokens are indexed by their
+# windows of MINIMUM_TOKENS consecutive tokens; each run of added tokens is
+# then scanned for windows in the index, and each hit is extended as far as the
+# tokens agree.  The tokens of a moved phrase, in both places, have the version
+# added to their moved_in, so that SequenceHistory.html marks them as moved.
+# The cost is bounded by MAXIMUM_TOKENS, above which a paragraph is skipped,
+# and MAXIMUM_OCCURRENCES, the number of occurrences of a window that are
+# tried.
+
+MINIMUM_TOKENS = 8
+# Moved phrases must contain at least this many word tokens, so that runs of
+# punctuation and short function words are not reported.
+MINIMUM_WORDS = 3
+MAXIMUM_TOKENS = 4000
+MAXIMUM_OCCURRENCES = 8
+
+def _runs(paragraph: SequenceHistory, in_run):
+  runs = []
+  previous = False
+  for _, c in paragraph.elements:
+    current = in_run(c)
+    if current:
+      if not previous:
+        runs.append([])
+      runs[-1].append(c)
+    previous = current
+  return runs
+
+# Marks the phrases of the given paragraph moved in the given version, and
+# returns their texts.
+def find_moved_phrases(paragraph: SequenceHistory, version: Version) -> list[str]:
+  removed = _runs(paragraph, lambda c: c.removed == version)
+  added = _runs(paragraph, lambda c: c.added == version)
+  if not removed or not added:
+    return []
+  if sum(len(run) for run in removed) + sum(len(run) for run in added) > MAXIMUM_TOKENS:
+    return []
+  windows : dict[tuple[str, ...], list[tuple[int, int]]] = {}
+  for r, run in enumerate(removed):
+    texts = [c.text for c in run]
+    for i in range(len(run) - MINIMUM_TOKENS + 1):
+      occurrences = windows.setdefault(tuple(texts[i:i + MINIMUM_TOKENS]), [])
+      if len(occurrences) < MAXIMUM_OCCURRENCES:
+        occurrences.append((r, i))
+  moves = []
+  for run in added:
+    texts = [c.text for c in run]
+    i = 0
+    while i <= len(run) - MINIMUM_TOKENS:
+      best = None
+      for r, j in windows.get(tuple(texts[i:i + MINIMUM_TOKENS]), ()):
+        source = removed[r]
+        length = MINIMUM_TOKENS
+        while (i + length < len(run) and j + length < len(source) and
+               run[i + length].text == source[j + length].text):
+          length += 1
+        if not best or length > best[2]:
+          best = (r, j, length)
+      if not best:
+        i += 1
+        continue
+      r, j, length = best
+      phrase = run[i:i + length]
+      if sum(1 for c in phrase if c.text[:1].isalnum()) < MINIMUM_WORDS:
+        i += 1
+        continue
+      for c in phrase + removed[r][j:j + length]:
+        if version not in c.moved_in:
+          c.moved_in += (version,)
+      moves.append("".join(c.text for c in phrase))
+      i += length
+  return moves
@@ -0,0 +1,176 @@
+import collections
+import contextlib
+import cProfile
+import gc
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Sequence
+
+# Wall-clock and CPU time of the phases of a run of lb_differ.py or
+# lb_rule_extractor.py.  Phases may be nested; each entry records the
+# enclosing phase, so that the per-version phases can be told apart from the
+# sub-phases within a version.
+# With a profile, the whole run between start_profile and write is also
+# profiled with cProfile, and the functions with the largest cumulative time
+# are included in the report.
+# With memory tracking, tracemalloc is started by start_memory, and at the end
+# of each top-level phase the entry records the traced memory, the peak during
+# the phase, the number of live instances of each of the given classes, and the
+# allocation sites that grew the most since the end of the previous top-level
+# phase.
+
+class PhaseTimings:
+  def __init__(self):
+    self.entries = []
+    self.stack = []
+    self.profile = None
+    self.counted_classes = None
+    self.snapshot = None
+
+  @contextlib.contextmanager
+  def phase(self, name: str, item: str = ""):
+    entry = {"phase": name, "item": item,
+             "parent": "/".join(self.stack) or None}
+    self.stack.append(f"{name}:{item}" if item else name)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+      yield
+    finally:
+      entry["wall"] = time.perf_counter() - wall
+      entry["cpu"] = time.process_time() - cpu
+      self.stack.pop()
+      if self.counted_classes is not None and not self.stack:
+        self.measure_memory(entry)
+      self.entries.append(entry)
+
+  def start_memory(self, counted_classes: Sequence[type]):
+    self.counted_classes = tuple(counted_classes)
+    tracemalloc.start()
+    self.snapshot = tracemalloc.take_snapshot()
+
+  def measure_memory(self, entry, top: int = 5):
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    entry["memory"] = current
+    entry["peak_memory"] = peak
+    counts = collections.Counter(type(o) for o in gc.get_objects()
+                                 if isinstance(o, self.counted_classes))
+    entry["objects"] = {cls.__name__: counts[cls] for cls in self.counted_classes}
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),))
+    entry["growth"] = [{"site": str(stat.traceback), "bytes": stat.size_diff, "count": stat.count_diff}
+                       for stat in snapshot.compare_to(self.snapshot, "lineno")[:top]]
+    self.snapshot = snapshot
+
+  def start_profile(self):
+    self.profile = cProfile.Profile()
+    self.profile.enable()
+
+  # Total time of each phase over all its items, in order of first occurrence.
+  def totals(self):
+    totals = {}
+    for entry in self.entries:
+      total = totals.setdefault(entry["phase"], {"wall": 0.0, "cpu": 0.0, "count": 0})
+      total["wall"] += entry["wall"]
+      total["cpu"] += entry["cpu"]
+      total["count"] += 1
+    return totals
+
+  def top_functions(self, n: int):
+    stats = pstats.Stats(self.profile, stream=io.StringIO())
+    functions = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+      functions.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                        "tottime": tottime, "cumtime": cumtime})
+    functions.sort(key=lambda f: f["cumtime"], reverse=True)
+    return functions[:n]
+
+  def report(self, top: int = 10):
+    report = {"totals": self.totals(), "entries": self.entries}
+    if self.profile:
+      report["profile"] = self.top_functions(top)
+    return report
+
+  def print_summary(self, top: int = 10, file=sys.stdout):
+    print(f"{'phase':40}{'wall':>10}{'cpu':>10}", file=file)
+    for name, total in self.totals().items():
+      print(f"{name:40}{total['wall']:10.3f}{total['cpu']:10.3f}", file=file)
+    print(f"Slowest {top} items:", file=file)
+    for entry in sorted(self.entries, key=lambda e: e["wall"], reverse=True)[:top]:
+      name = f"{entry['phase']} {entry['item']}".strip()
+      print(f"{name:40}{entry['wall']:10.3f}{entry['cpu']:10.3f}", file=file)
+    if self.counted_classes is not None:
+      print("Memory at the end of each phase, and increase over the phase:", file=file)
+      names = [cls.__name__ for cls in self.counted_classes]
+      print(f"{'phase':24}{'MiB':>8}{'+MiB':>8}{'peak':>8}" +
+            "".join(f"{name:>18}" for name in names), file=file)
+      previous = {"memory": 0, "objects": dict.fromkeys(names, 0)}
+      for entry in self.entries:
+        if "memory" not in entry:
+          continue
+        name = f"{entry['phase']} {entry['item']}".strip()
+        print(f"{name:24}{entry['memory'] / 2**20:8.1f}"
+              f"{(entry['memory'] - previous['memory']) / 2**20:+8.1f}"
+              f"{entry['peak_memory'] / 2**20:8.1f}" +
+              "".join(f"{entry['objects'][n]:>10}{entry['objects'][n] - previous['objects'][n]:+8}"
+                      for n in names), file=file)
+        previous = entry
+    if self.profile:
+      print(f"Top {top} functions by cumulative time:", file=file)
+      for function in self.top_functions(top):
+        print(f"{function['cumtime']:10.3f}{function['tottime']:10.3f}{function['calls']:10} "
+              f"{function['function']}", file=file)
+
+  # Stops profiling, and writes the report as JSON to timings_path and the
+  # profile, in the format of pstats, to profile_path, if given.
+  def write(self, timings_path: str = None, profile_path: str = None, top: int = 10):
+    if self.profile:
+      self.profile.disable()
+      if profile_path:
+        self.profile.dump_stats(profile_path)
+    if timings_path:
+      with open(timings_path, "w", encoding="utf-8") as f:
+        json.dump(self.report(top), f, indent=2)
+    self.print_summary(top)
+
+# Telemetry of the diffs computed by SequenceHistory.add_version, passed to it
+# as record_diff: for each diff, the version, the paragraph (None for the diff
+# of the document as a sequence of paragraphs, and "new" for the histories
+# built only to get the value of new paragraphs), the number of old and new
+# tokens, the number of opcodes, and the time spent in difflib.
+class DiffTelemetry:
+  def __init__(self):
+    self.records = []
+
+  def record(self, version, old_length, new_length, opcode_count, seconds, *context):
+    if not context:
+      paragraph = None
+    elif context[-1] is None:
+      paragraph = "new"
+    else:
+      paragraph = str(context[-1])
+    self.records.append({"version": str(version), "paragraph": paragraph,
+                         "old_tokens": old_length, "new_tokens": new_length,
+                         "opcodes": opcode_count, "seconds": seconds})
+
+  def slowest(self, top: int = 10):
+    return sorted(self.records, key=lambda r: r["seconds"], reverse=True)[:top]
+
+  def print_summary(self, top: int = 10, file=sys.stdout):
+    total = sum(r["seconds"] for r in self.records)
+    print(f"{len(self.records)} diffs, {total:.3f} s; slowest {top}:", file=file)
+    print(f"{'version':10}{'paragraph':16}{'old':>8}{'new':>8}{'opcodes':>9}{'seconds':>10}", file=file)
+    for r in self.slowest(top):
+      print(f"{r['version']:10}{r['paragraph'] or 'document':16}{r['old_tokens']:8}"
+            f"{r['new_tokens']:8}{r['opcodes']:9}{r['seconds']:10.4f}", file=file)
+
+  def write(self, path: str = None, top: int = 10):
+    if path:
+      with open(path, "w", encoding="utf-8") as f:
+        json.dump({"slowest": self.slowest(top), "records": self.records}, f)
+    self.print_summary(top)
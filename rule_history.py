@@ -0,0 +1,178 @@
+import html
+import json
+import re
+from typing import Optional, Sequence, TextIO
+
+from annotations import Annotation, Issue
+from document import Formula, Heading, Rule, TableRow
+from historical_diff import Version, ParagraphNumber, SequenceHistory, CELL_SEPARATOR
+from rule_renumbering import RenumberingIndex
+
+# The history of each rule of the line breaking algorithm, gathered in one pass
+# over history.elements.  A rule is a Rule paragraph together with the Formula,
+# TableRow, and annotation paragraphs that follow it, up to the next Rule or
+# Heading; its history comprises:
+#   texts: the (version, rule number, text) of the rule in each version in
+#     which its text changed, where the text is that of its paragraphs present
+#     in that version, one per line, so that its text in any version is that of
+#     the latest entry that is not newer; the cells of the TableRow paragraphs
+#     are delimited by CELL_SEPARATOR, see text_lines;
+#   renumberings: the (version, old number, new number, table) for each
+#     version in which the number in the text of the rule changed, where table
+#     is the numbers in that version of the rules that the old number became
+#     according to the renumbering table, or None if the table does not cover
+#     that change;
+#   issues: the issues attributed to any of its paragraphs.
+# Rule numbers are those found after "LB" at the start of the text of the Rule
+# paragraph, without the "LB", e.g., "12a"; rule is None if the text has no
+# number.
+
+RULE_NUMBER = re.compile(r"LB\s*(\d+[a-z]?)")
+
+def rule_number(text: str) -> Optional[str]:
+  match = RULE_NUMBER.match(text)
+  return match.group(1) if match else None
+
+class RuleHistory:
+  def __init__(self, paragraph_number: ParagraphNumber, paragraph: SequenceHistory):
+    self.number = paragraph_number
+    self.paragraph = paragraph
+    # The paragraphs of the rule, starting with the Rule paragraph.
+    self.paragraphs : list[tuple[ParagraphNumber, SequenceHistory]] = [(paragraph_number, paragraph)]
+    self.texts : list[tuple[Version, Optional[str], str]] = []
+    self.renumberings : list[tuple[Version, str, str, Optional[tuple[str, ...]]]] = []
+    self.issues : list[Issue] = []
+
+  # The number of the rule in its latest version.
+  def rule(self) -> Optional[str]:
+    return self.texts[-1][1] if self.texts else None
+
+  def add_issues(self, issues: Sequence[Issue]):
+    for issue in issues:
+      if issue not in self.issues:
+        self.issues.append(issue)
+
+# The lines of a rule text, where the rows of its tables are lists of cells.
+def text_lines(text: str) -> list:
+  return [line.split(CELL_SEPARATOR) if CELL_SEPARATOR in line else line
+          for line in text.split("\n")]
+
+# A rule text as HTML, with consecutive table rows rendered as one table.
+def text_html(text: str) -> str:
+  blocks = []
+  for line in text_lines(text):
+    if isinstance(line, list):
+      row = "<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in line) + "</tr>"
+      if blocks and isinstance(blocks[-1], list):
+        blocks[-1].append(row)
+      else:
+        blocks.append([row])
+    else:
+      blocks.append(html.escape(line))
+  result = ""
+  for previous, block in zip([None] + blocks, blocks):
+    if isinstance(block, list):
+      result += f"<table>{''.join(block)}</table>"
+    else:
+      result += ("<br>" if isinstance(previous, str) else "") + block
+  return result
+
+def table_renumbering(index: RenumberingIndex, rule: str, old: Version, new: Version):
+  try:
+    if index.column(old) == index.column(new):
+      return None
+    return index.lookup(rule, old, new)
+  except KeyError:
+    return None
+
+def build_rule_histories(history: SequenceHistory, versions: Sequence[Version],
+                         index: RenumberingIndex) -> list[RuleHistory]:
+  versions = sorted(versions)
+  rules = []
+  current = None
+  for paragraph_number, paragraph in history.elements:
+    if isinstance(paragraph.tag, Rule):
+      current = RuleHistory(paragraph_number, paragraph)
+      rules.append(current)
+    elif isinstance(paragraph.tag, Heading):
+      current = None
+    elif current and isinstance(paragraph.tag, (Formula, TableRow, Annotation)):
+      current.paragraphs.append((paragraph_number, paragraph))
+    else:
+      continue
+    if current:
+      current.add_issues(paragraph.references)
+  for r in rules:
+    previous = None
+    for version in versions:
+      rule_text = r.paragraph.value_at(version)
+      text = "\n".join(t for t in (p.value_at(version) for _, p in r.paragraphs) if t)
+      if not text:
+        continue
+      rule = rule_number(rule_text)
+      if previous and rule != previous[1] and previous[1] and rule:
+        r.renumberings.append(
+            (version, previous[1], rule, table_renumbering(index, previous[1], previous[0], version)))
+      if not r.texts or text != r.texts[-1][2]:
+        r.texts.append((version, rule, text))
+      if rule_text:
+        previous = (version, rule)
+  return rules
+
+def _issue_record(issue: Issue):
+  return {"version": str(issue.version),
+          "l2_refs": list(issue.l2_refs),
+          "l2_docs": list(issue.l2_docs),
+          "pri": list(issue.pri),
+          "source_line": issue.source_line}
+
+def write_rule_history_json(rules: Sequence[RuleHistory], path: str):
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump([{"paragraph": str(r.number),
+                "paragraphs": [str(number) for number, _ in r.paragraphs],
+                "rule": r.rule(),
+                "removed": str(r.paragraph.last_changed()) if r.paragraph.absent() else None,
+                "texts": [{"version": str(version), "rule": rule, "lines": text_lines(text)}
+                          for version, rule, text in r.texts],
+                "renumberings": [{"version": str(version), "from": old, "to": new,
+                                  "table": list(table) if table is not None else None}
+                                 for version, old, new, table in r.renumberings],
+                "issues": [_issue_record(issue) for issue in r.issues]}
+               for r in rules],
+              f, ensure_ascii=False, indent=1)
+
+# Prints the body of the HTML view of the rule histories, with links to the
+# paragraphs of the annotated algorithm at alba_path; pri_link renders the PRI
+# references of the issues, as lb_differ.pri_link.
+def print_rule_history(rules: Sequence[RuleHistory], f: TextIO, alba_path="alba.html",
+                       pri_link=html.escape):
+  print("<h1>History of the line breaking rules</h1>", file=f)
+  for r in rules:
+    title = f"LB{r.rule()}" if r.rule() else "Unnumbered rule"
+    removed = f", removed in {r.paragraph.last_changed()}" if r.paragraph.absent() else ""
+    print(f'<h2 id=rule-{r.number}>{title} (<a href="{alba_path}#p{r.number}">{r.number}</a>{removed})</h2>', file=f)
+    print("<table>", file=f)
+    for version, rule, text in r.texts:
+      print(f'<tr><td><ins class="changed-in-{version.html_class()}">{version}</ins></td><td>{text_html(text)}</td></tr>', file=f)
+    print("</table>", file=f)
+    if r.renumberings:
+      print("<ul>", file=f)
+      for version, old, new, table in r.renumberings:
+        expected = ""
+        if table is not None and table != (new,):
+          expected = f" (renumbering table: {', '.join('LB' + t for t in table) or 'deleted'})"
+        print(f"<li>Renumbered from LB{old} to LB{new} in {version}{expected}</li>", file=f)
+      print("</ul>", file=f)
+    if r.issues:
+      print("<div class=sources>", file=f)
+      for issue in r.issues:
+        print(f'<ins class="changed-in-{issue.version.html_class()} sources">{{{issue.version}: ' +
+              "; ".join(part for part in (
+                  ", ".join(f'<a href="https://www.unicode.org/cgi-bin/GetL2Ref.pl?{l2ref}">{l2ref}</a>'
+                            for l2ref in issue.l2_refs),
+                  ", ".join(f'<a href="https://www.unicode.org/cgi-bin/GetMatchingDocs.pl?{l2doc}">{l2doc}</a>'
+                            for l2doc in issue.l2_docs),
+                  ", ".join(pri_link(pri) for pri in issue.pri))
+                if part) +
+              "}</ins>", file=f)
+      print("</div>", file=f)
@@ -0,0 +1,135 @@
+import bisect
+import csv
+import re
+import sys
+from typing import Optional
+
+from historical_diff import Version
+
+# Index of the numbers of the rules of the line breaking algorithm across
+# versions, composed from the renumberings between consecutive columns of
+# renumberings.tsv (Table 5 of the proposed update for Unicode 9.0.0, which
+# traces each rule back to Unicode 3.0.1, extended to 16.0.0 from the rules of
+# the later versions: LB15 was split into LB15a and LB15b in 15.1.0, which also
+# added LB28a, and 16.0.0 added LB15c, LB15d, LB19a, and LB20a).
+# lookup(rule, from_version, to_version) returns, in constant time, the numbers
+# in to_version of the rules that rule in from_version became (going forward)
+# or came from (going backward): one number if the rule was merely renumbered,
+# several if it was split (or if several rules were merged into it, going
+# backward), and none if it was deleted (or created, going backward) in
+# between.  Versions that are not columns of the table use the latest column
+# that is not newer than them (the rules were not renumbered between 9.0.0 and
+# 15.1.0); versions before the first column or after the last are rejected,
+# since the table says nothing of them.
+
+def read_renumberings(path="renumberings.tsv"):
+  def parse_version(s):
+    return Version(*(int(v) for v in re.match(r"(\d+)\.(\d)\.(\d)", s).groups()))
+  with open(path) as f:
+    rows = csv.reader(f, delimiter="\t")
+    columns = [tuple(re.sub(r"LB|deprecated|removed", "", entry).strip() or None for entry in column) for column in zip(*rows)]
+  table_5_by_columns = {parse_version(column[0]) : tuple(column[1:]) for column in columns}
+  renumberings = {parse_version(left[0]) : tuple(zip(left[1:], right[1:])) for left, right in zip(columns[:-1], columns[1:])}
+  return table_5_by_columns, renumberings
+
+def rule_sort_key(rule: str):
+  return re.sub(r"^(\d)(?!\d)", r"0\1", rule)
+
+class RenumberingIndex:
+  # versions are the columns of the table; renumberings maps each of them but
+  # the oldest to the (new, old) pairs of rule numbers relating it to the
+  # previous one, as lb_differ.RENUMBERINGS.
+  def __init__(self, versions, renumberings: dict[Version, tuple[tuple[Optional[str], Optional[str]], ...]]):
+    self.versions = sorted(versions)
+    oldest, *newer_versions = self.versions
+    forward = []
+    backward = []
+    rules = {oldest: set()}
+    for version in newer_versions:
+      step_forward : dict[str, set[str]] = {}
+      step_backward : dict[str, set[str]] = {}
+      rules[version] = set()
+      for new, old in renumberings[version]:
+        if old:
+          rules[self.versions[self.versions.index(version) - 1]].add(old)
+          step_forward.setdefault(old, set())
+        if new:
+          rules[version].add(new)
+          step_backward.setdefault(new, set())
+        if old and new:
+          step_forward[old].add(new)
+          step_backward[new].add(old)
+      forward.append(step_forward)
+      backward.append(step_backward)
+    self.rules = {version: sorted(r, key=rule_sort_key) for version, r in rules.items()}
+    self.index : dict[tuple[str, Version, Version], tuple[str, ...]] = {}
+    for i, version in enumerate(self.versions):
+      for rule in self.rules[version]:
+        self.index[(rule, version, version)] = (rule,)
+        current = {rule}
+        for j in range(i, len(forward)):
+          current = set().union(*(forward[j].get(r, ()) for r in current))
+          self.index[(rule, version, self.versions[j + 1])] = tuple(sorted(current, key=rule_sort_key))
+        current = {rule}
+        for j in range(i - 1, -1, -1):
+          current = set().union(*(backward[j].get(r, ()) for r in current))
+          self.index[(rule, version, self.versions[j])] = tuple(sorted(current, key=rule_sort_key))
+
+  # The column of the table in effect in the given version.
+  def column(self, version: Version) -> Version:
+    i = bisect.bisect_right(self.versions, version)
+    if i == 0:
+      raise KeyError(f"{version} is older than the renumbering table")
+    if version > self.versions[-1]:
+      raise KeyError(f"{version} is newer than the renumbering table")
+    return self.versions[i - 1]
+
+  def lookup(self, rule: str, from_version: Version, to_version: Version) -> tuple[str, ...]:
+    return self.index[(rule, self.column(from_version), self.column(to_version))]
+
+  # Why lookup returns no rules: the column in which the rule was deleted (going
+  # forward) or in which the rules that it came from were created (going
+  # backward).
+  def absence(self, rule: str, from_version: Version, to_version: Version) -> str:
+    first = self.versions.index(self.column(from_version))
+    last = self.versions.index(self.column(to_version))
+    if last >= first:
+      for i in range(first + 1, last + 1):
+        if not self.index[(rule, self.versions[first], self.versions[i])]:
+          return f"deleted in {self.versions[i]}"
+    else:
+      for i in range(first - 1, last - 1, -1):
+        if not self.index[(rule, self.versions[first], self.versions[i])]:
+          return f"created in {self.versions[i + 1]}"
+    raise ValueError(f"LB{rule} is present in {to_version}")
+
+if __name__ == "__main__":
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  if "rule" not in args:
+    print("Usage: rule_renumbering.py --rule=LB12 [--from=3.0.1] [--to=16.0.0]")
+    sys.exit(1)
+  def parse_version(s):
+    if not re.fullmatch(r"\d+\.\d+\.\d+", s):
+      print(f"Invalid version {s}; versions are of the form 16.0.0")
+      sys.exit(1)
+    return Version(*(int(v) for v in s.split(".")))
+  table_5_by_columns, renumberings = read_renumberings()
+  index = RenumberingIndex(table_5_by_columns, renumberings)
+  rule = re.sub(r"^LB", "", args["rule"])
+  from_version = parse_version(args["from"]) if "from" in args else index.versions[0]
+  targets = [parse_version(args["to"])] if "to" in args else index.versions
+  for version in [from_version] + targets:
+    try:
+      index.column(version)
+    except KeyError as e:
+      print(f"{e.args[0]}, which covers {index.versions[0]} to {index.versions[-1]}")
+      sys.exit(1)
+  if rule not in index.rules[index.column(from_version)]:
+    print(f"There is no LB{rule} in {from_version} (numbering of {index.column(from_version)}); "
+          f"its rules are {', '.join('LB' + r for r in index.rules[index.column(from_version)])}")
+    sys.exit(1)
+  for to_version in targets:
+    rules = index.lookup(rule, from_version, to_version)
+    print(f"LB{rule} in {from_version}: " +
+          (f"{', '.join('LB' + r for r in rules)} in {to_version}" if rules else
+           f"none in {to_version} ({index.absence(rule, from_version, to_version)})"))
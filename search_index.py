@@ -0,0 +1,53 @@
+import json
+import os
+import re
+from typing import Sequence
+
+from historical_diff import Version, SequenceHistory
+
+# Inverted index of the words of the paragraphs at each version, used by the
+# search box of alba.js.  directory/index.json holds the versions (in the order
+# of the bits of the masks below), the paragraph numbers, and the list of
+# shards; each shard, directory/<shard>.json, maps the words that start with a
+# given prefix to a flat list of postings [paragraph, mask, paragraph, mask...],
+# where paragraph is an index into the paragraph numbers, and bit j of mask is
+# set if the word occurs in the paragraph in versions[j].
+# The words are lowercased sequences of \w, as matched by alba.js.
+
+WORD = re.compile(r"\w+")
+PREFIX_LENGTH = 2
+
+def words(text: str):
+  return WORD.findall(text.lower())
+
+# The name of the shard containing the given word: the code points of its
+# prefix in hexadecimal, since the prefix may not be a valid file name.
+def shard_name(word: str):
+  return "-".join(f"{ord(c):x}" for c in word[:PREFIX_LENGTH])
+
+def write_search_index(history: SequenceHistory, versions: Sequence[Version], directory: str):
+  if len(versions) > 31:
+    raise ValueError("alba.js treats the version masks as 32-bit integers")
+  os.makedirs(directory, exist_ok=True)
+  numbers = []
+  postings : dict[str, list[int]] = {}
+  for i, (paragraph_number, paragraph) in enumerate(history.elements):
+    numbers.append(str(paragraph_number))
+    masks : dict[str, int] = {}
+    for j, version in enumerate(versions):
+      for word in set(words(paragraph.value_at(version))):
+        masks[word] = masks.get(word, 0) | 1 << j
+    for word, mask in masks.items():
+      postings.setdefault(word, []).extend((i, mask))
+  shards : dict[str, dict[str, list[int]]] = {}
+  for word, word_postings in sorted(postings.items()):
+    shards.setdefault(shard_name(word), {})[word] = word_postings
+  for name, shard in shards.items():
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+      json.dump(shard, f, ensure_ascii=False, separators=(",", ":"))
+  with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+    json.dump({"versions": [version.html_class() for version in versions],
+               "paragraphs": numbers,
+               "prefix_length": PREFIX_LENGTH,
+               "shards": sorted(shards)},
+              f, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,51 @@
+import functools
+import re
+import sys
+import time
+
+# Segmentation of paragraph text into the tokens that are diffed.
+# The text is split at word boundaries, between any two non-word characters,
+# before "ing" at the end of a word, and around table cell separators.  Empty
+# tokens are dropped (except that an empty text is a single empty token, so
+# that its history is not empty), and runs of whitespace are kept together as
+# one token, so that the tokens still concatenate to the text.
+# These are the boundaries that Paragraph.words() has always used, not those of
+# UAX #29: the history, and the ANCESTRIES, JUNK and hints of lb_differ.py, are
+# tuned to them, and UAX #29 would, e.g., keep "can't" or "3.0.1" together and
+# not split before "ing".  The standard library has no Word_Break property.
+# TODO(egg): Look at UAX #29.
+
+# Runs of whitespace are not split, by the negative lookahead.
+WORD_BOUNDARY = re.compile(r"\b|(?<=\W)(?=\W)(?!(?<=\s)\s)|(?=ing\b)|(?<=\uE000)|(?=\uE000)")
+
+# The tokens of the texts most recently split, keyed by text: most paragraphs
+# are unchanged from one version to the next.
+@functools.lru_cache(maxsize=1 << 14)
+def split_words(text: str) -> tuple[str, ...]:
+  return tuple([token for token in WORD_BOUNDARY.split(text) if token]) or ("",)
+
+if __name__ == "__main__":
+  # Compares the number of tokens and the time taken with the split used
+  # before, over all the versions of paragraphs.py.
+  from historical_diff import Version
+  from document import Paragraph, Heading, Rule, Formula, TableRow, CodeLine
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  with open(args.get("paragraphs", "paragraphs.py"), encoding="utf-8") as f:
+    texts = [p.contents for paragraphs in eval(f.read()).values() for p in paragraphs]
+  start = time.perf_counter()
+  plain = sum(len(re.split(r"\b|(?<=\W)(?=\W)|(?=ing\b)|(?<=\uE000)|(?=\uE000)", text))
+              for text in texts)
+  plain_time = time.perf_counter() - start
+  start = time.perf_counter()
+  sum(len(split_words.__wrapped__(text)) for text in texts)
+  uncached_time = time.perf_counter() - start
+  start = time.perf_counter()
+  segmented = sum(len(split_words(text)) for text in texts)
+  cold_time = time.perf_counter() - start
+  start = time.perf_counter()
+  sum(len(split_words(text)) for text in texts)
+  warm_time = time.perf_counter() - start
+  print(f"{len(texts)} texts, {len(set(texts))} distinct")
+  print(f"previous split: {plain} tokens, {plain_time:.3f} s")
+  print(f"split_words: {segmented} tokens, {uncached_time:.3f} s uncached, "
+        f"{cold_time:.3f} s with an empty cache, {warm_time:.3f} s with a full cache")
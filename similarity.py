@@ -0,0 +1,73 @@
+import bisect
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Sequence
+
+from document import Paragraph
+
+# Finds, among the paragraphs of a version, the one most similar to a given
+# text, as max(candidates, key=lambda p: SequenceMatcher(None, p.contents,
+# text).ratio()) would, without computing the ratio for most candidates.
+# The candidates are looked up in a per-type index sorted by contents, so that
+# those starting with a given hint are a range.  Each candidate has a sketch,
+# the multiset of its characters, from which the upper bound of the ratio that
+# SequenceMatcher.quick_ratio computes is obtained without building a matcher;
+# exact ratios are computed in decreasing order of that bound, until the bound
+# falls below the best ratio found.  Ties go to the earliest candidate, as with
+# max.
+
+# Greater than any character that occurs in the text.
+LAST_CHARACTER = "\U0010FFFF"
+
+def ratio(matches: int, length: int):
+  # As difflib._calculate_ratio, so that bounds and ratios compare exactly.
+  return 2.0 * matches / length if length else 1.0
+
+class SimilarityIndex:
+  def __init__(self, paragraphs: Sequence[Paragraph]):
+    self.paragraphs = paragraphs
+    self.by_type : dict[type, list[tuple[str, int]]] = {}
+    for i, p in enumerate(paragraphs):
+      self.by_type.setdefault(type(p), []).append((p.contents, i))
+    for entries in self.by_type.values():
+      entries.sort()
+    self.sketches : dict[int, Counter] = {}
+    self.exact_ratios = 0
+    self.bounds = 0
+
+  # The indices of the paragraphs of the given type that start with hint, in
+  # document order.
+  def candidates(self, paragraph_type: type, hint: str = "") -> list[int]:
+    entries = self.by_type.get(paragraph_type, [])
+    begin = bisect.bisect_left(entries, (hint,))
+    end = bisect.bisect_left(entries, (hint + LAST_CHARACTER,))
+    return sorted(i for _, i in entries[begin:end])
+
+  def sketch(self, i: int) -> Counter:
+    if i not in self.sketches:
+      self.sketches[i] = Counter(self.paragraphs[i].contents)
+    return self.sketches[i]
+
+  def most_similar(self, candidates: Sequence[int], text: str) -> Paragraph:
+    if not candidates:
+      raise ValueError("no candidates")
+    text_sketch = Counter(text)
+    bounded = []
+    for i in candidates:
+      length = len(self.paragraphs[i].contents) + len(text)
+      matches = sum((self.sketch(i) & text_sketch).values())
+      bounded.append((-ratio(matches, length), i))
+      self.bounds += 1
+    bounded.sort()
+    matcher = SequenceMatcher(None, "", text)
+    best = None
+    best_ratio = -1.0
+    for negative_bound, i in bounded:
+      if -negative_bound < best_ratio:
+        break
+      matcher.set_seq1(self.paragraphs[i].contents)
+      r = matcher.ratio()
+      self.exact_ratios += 1
+      if r > best_ratio or (r == best_ratio and i < best):
+        best, best_ratio = i, r
+    return self.paragraphs[best]
@@ -0,0 +1,98 @@
+import re
+from typing import Optional, Tuple
+
+from historical_diff import Version, SequenceHistory
+
+# Resolves the markup of the annotated document for a fixed (base, head) pair
+# the way meow() in alba.js does in the browser, except that whatever meow()
+# would hide is dropped rather than styled with display:none.
+
+_TAG = re.compile(r"(</?(?:ins|del)\b[^>]*>)")
+_CLASS = re.compile(r'class=(?:"([^"]*)"|(\S+?))(?=[\s>])')
+_VERSION_CLASS = re.compile(r"changed-in-(\d+)-(\d+)-(\d+)")
+
+def _parse_version_class(c: str) -> Optional[Version]:
+  match = _VERSION_CLASS.fullmatch(c)
+  return Version(*(int(v) for v in match.groups())) if match else None
+
+def versions_mentioned(markup: str):
+  return set(Version(*(int(v) for v in match.groups()))
+             for match in _VERSION_CLASS.finditer(markup))
+
+def resolve(markup: str, base: Version, head: Version) -> str:
+  text = ""
+  # For each open <ins> or <del>, whether its tag is kept (with the given
+  # replacement tag), unwrapped (None), or the whole element dropped (False).
+  stack = []
+  dropping = 0
+  for i, part in enumerate(_TAG.split(markup)):
+    if i % 2 == 0:
+      if not dropping:
+        text += part
+      continue
+    if part.startswith("</"):
+      action = stack.pop()
+      if action is False:
+        dropping -= 1
+      elif action and not dropping:
+        text += part
+      continue
+    tag = part[1:4]
+    match = _CLASS.search(part)
+    classes = (match.group(1) or match.group(2)).split() if match else []
+    versions = [v for v in (_parse_version_class(c) for c in classes) if v]
+    if dropping or not versions:
+      action = part
+    else:
+      version = versions[-1]
+      others = [c for c in classes if not _parse_version_class(c)]
+      if tag == "ins":
+        if version > head or (version <= base and "diff-comment" in others):
+          action = False
+        elif version <= base:
+          action = f'<ins class="{" ".join(others)}">' if others else None
+        else:
+          action = part
+      else:
+        if version <= base:
+          action = False
+        elif version > head:
+          action = None
+        elif "paranum" in others:
+          action = False
+        else:
+          action = part
+    stack.append(action)
+    if action is False:
+      dropping += 1
+    elif action and not dropping:
+      text += action
+  return text
+
+class StaticViewCache:
+  # Caches the static markup of each paragraph for every (base, head) pair
+  # that it is rendered for.  The resolved markup of a paragraph only depends
+  # on where each of the versions that it mentions falls with respect to base
+  # and head, so most pairs of a matrix of views hit the cache.
+  def __init__(self):
+    self.markup : dict[int, Tuple[str, list[Version]]] = {}
+    self.views : dict[Tuple[int, Tuple[int, ...]], str] = {}
+    self.hits = 0
+    self.misses = 0
+
+  def add(self, index: int, markup: str, paragraph: SequenceHistory):
+    versions = versions_mentioned(markup).union(paragraph.versions_changed())
+    self.markup[index] = (markup, sorted(versions))
+
+  def get(self, index: int, base: Version, head: Version) -> str:
+    markup, versions = self.markup[index]
+    key = (index, tuple(0 if v <= base else 2 if v > head else 1 for v in versions))
+    if key in self.views:
+      self.hits += 1
+    else:
+      self.misses += 1
+      self.views[key] = resolve(markup, base, head)
+    return self.views[key]
+
+def static_view_file(base: Version, head: Version):
+  return f"{base}-{head}.html"
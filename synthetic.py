@@ -0,0 +1,180 @@
+import csv
+import random
+import sys
+import time
+import tracemalloc
+from typing import Sequence
+
+from document import Paragraph, Rule, TableRow, is_default_junk, get_granularity
+from historical_diff import Version, SequenceHistory, CELL_SEPARATOR
+
+# Synthetic revisions of a document, for measuring how SequenceHistory scales
+# with the size of the document and the number of versions.
+# Each revision is derived from the previous one by editing words in some
+# paragraphs, inserting, deleting, moving, and splitting paragraphs, at the
+# given rates (per paragraph and per revision).  Insertions go to uniformly
+# distributed positions, to the end of the document, or to a few clustered
+# positions, depending on insert_positions.
+
+SYLLABLES = ["ka", "lo", "mi", "nu", "pe", "ra", "si", "to", "ve", "zu", "an", "el", "or", "ix"]
+
+class SyntheticDocument:
+  def __init__(
+      self,
+      paragraphs: int,
+      seed: int = 0,
+      words_per_paragraph: int = 40,
+      rule_fraction: float = 0.05,
+      table_row_fraction: float = 0.2):
+    self.random = random.Random(seed)
+    self.words_per_paragraph = words_per_paragraph
+    self.rule_fraction = rule_fraction
+    self.table_row_fraction = table_row_fraction
+    self.vocabulary = ["".join(self.random.choice(SYLLABLES)
+                               for _ in range(self.random.randint(1, 4)))
+                       for _ in range(2000)]
+    self.rules = 0
+    self.paragraphs : list[Paragraph] = [self.new_paragraph() for _ in range(paragraphs)]
+
+  def sentence(self, words):
+    text = " ".join(self.random.choice(self.vocabulary) for _ in range(max(words, 1)))
+    return text[0].upper() + text[1:] + "."
+
+  def new_paragraph(self) -> Paragraph:
+    kind = self.random.random()
+    if kind < self.rule_fraction:
+      self.rules += 1
+      return Rule(f"LB{self.rules} " + self.sentence(self.random.randint(4, 12)))
+    elif kind < self.rule_fraction + self.table_row_fraction:
+      return TableRow(CELL_SEPARATOR.join(self.sentence(self.random.randint(1, 6))
+                                    for _ in range(self.random.randint(2, 6))))
+    words = max(1, int(self.random.expovariate(1 / self.words_per_paragraph)))
+    sentences = []
+    while words > 0:
+      length = min(words, self.random.randint(5, 20))
+      sentences.append(self.sentence(length))
+      words -= length
+    return Paragraph(" ".join(sentences))
+
+  def edit(self, paragraph: Paragraph) -> Paragraph:
+    words = paragraph.contents.split(" ")
+    for _ in range(self.random.randint(1, 3)):
+      i = self.random.randrange(len(words))
+      operation = self.random.random()
+      if operation < 0.4:
+        words[i] = self.random.choice(self.vocabulary)
+      elif operation < 0.7:
+        words.insert(i, self.random.choice(self.vocabulary))
+      elif len(words) > 1:
+        del words[i]
+    return type(paragraph)(" ".join(words))
+
+  def split(self, paragraph: Paragraph) -> Sequence[Paragraph]:
+    words = paragraph.contents.split(" ")
+    if len(words) < 4:
+      return [paragraph]
+    i = self.random.randrange(2, len(words) - 1)
+    return [type(paragraph)(" ".join(words[:i])), type(paragraph)(" ".join(words[i:]))]
+
+  def insertion_position(self, insert_positions: str, clusters: Sequence[float]):
+    if insert_positions == "end":
+      return len(self.paragraphs)
+    elif insert_positions == "clustered":
+      return int(self.random.choice(clusters) * len(self.paragraphs))
+    return self.random.randint(0, len(self.paragraphs))
+
+  def revise(
+      self,
+      edit_rate: float = 0.05,
+      insert_rate: float = 0.01,
+      delete_rate: float = 0.005,
+      move_rate: float = 0.002,
+      split_rate: float = 0.002,
+      insert_positions: str = "uniform"):
+    n = len(self.paragraphs)
+    revised = []
+    moved = []
+    for paragraph in self.paragraphs:
+      operation = self.random.random()
+      if operation < delete_rate:
+        continue
+      operation -= delete_rate
+      if operation < move_rate:
+        moved.append(paragraph)
+        continue
+      operation -= move_rate
+      if operation < split_rate:
+        revised += self.split(paragraph)
+        continue
+      operation -= split_rate
+      revised.append(self.edit(paragraph) if operation < edit_rate else paragraph)
+    self.paragraphs = revised
+    clusters = [self.random.random() for _ in range(3)]
+    for paragraph in moved:
+      self.paragraphs.insert(self.random.randint(0, len(self.paragraphs)), paragraph)
+    for _ in range(self.random.binomialvariate(n, insert_rate)
+                   if hasattr(self.random, "binomialvariate") else round(n * insert_rate)):
+      self.paragraphs.insert(self.insertion_position(insert_positions, clusters),
+                             self.new_paragraph())
+
+def synthetic_revisions(paragraphs: int, versions: int, seed: int = 0, **rates):
+  document = SyntheticDocument(paragraphs, seed)
+  revisions = {}
+  for i in range(versions):
+    if i:
+      document.revise(**rates)
+    revisions[Version(i + 1, 0, 0)] = list(document.paragraphs)
+  return revisions
+
+# As lb_differ.make_sequence_history, without the hints, which are specific to
+# the versions of UAX #14.
+def make_sequence_history(v, p: Paragraph, *context):
+  h = SequenceHistory(
+        junk=is_default_junk,
+        check_and_get_elements=lambda p, h, version, *context: p.words() if p else p,
+        get_granularity=get_granularity)
+  h.tag = p
+  h.add_version(v, p, *context)
+  return h
+
+def build(revisions):
+  history = SequenceHistory(element_history=make_sequence_history, number_nicely=True)
+  for version, paragraphs in revisions.items():
+    history.add_version(version, paragraphs)
+  return history
+
+# Builds the history of synthetic documents of each of the given sizes, with
+# each of the given numbers of versions, and reports the build time and the
+# peak memory traced during the build, in CSV, for plotting.
+def scaling_benchmark(sizes: Sequence[int], version_counts: Sequence[int], out, seed=0, **rates):
+  writer = csv.writer(out)
+  writer.writerow(["paragraphs", "versions", "final_paragraphs", "seconds", "peak_mib"])
+  for size in sizes:
+    for version_count in version_counts:
+      revisions = synthetic_revisions(size, version_count, seed, **rates)
+      start = time.perf_counter()
+      build(revisions)
+      seconds = time.perf_counter() - start
+      # Measured separately, since tracing slows down the build.
+      tracemalloc.start()
+      build(revisions)
+      _, peak = tracemalloc.get_traced_memory()
+      tracemalloc.stop()
+      writer.writerow([size, version_count, len(list(revisions.values())[-1]),
+                       f"{seconds:.3f}", f"{peak / 2**20:.1f}"])
+      out.flush()
+
+if __name__ == "__main__":
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  rates = {rate: float(args[rate.replace("_", "-")])
+           for rate in ("edit_rate", "insert_rate", "delete_rate", "move_rate", "split_rate")
+           if rate.replace("_", "-") in args}
+  if "insert-positions" in args:
+    rates["insert_positions"] = args["insert-positions"]
+  sizes = [int(n) for n in args.get("paragraphs", "250,500,1000,2000").split(",")]
+  version_counts = [int(n) for n in args.get("versions", "5,10,25").split(",")]
+  if "out" in args:
+    out = open(args["out"], "w", newline="", encoding="utf-8")
+  else:
+    out = sys.stdout
+  scaling_benchmark(sizes, version_counts, out, int(args.get("seed", "0")), **rates)
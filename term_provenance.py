@@ -0,0 +1,104 @@
+import json
+import sys
+from typing import Optional
+
+from historical_diff import Version, ParagraphNumber, SequenceHistory
+from segmentation import split_words
+
+# Inverted index from each term of a built history to its occurrences, as
+# (paragraph number, added, removed) triples, where added and removed are the
+# versions in which the occurrence was added and removed (None if it is still
+# present), built in one pass over history.elements.  The terms are the word
+# tokens of segmentation.split_words, casefolded, so that queries are
+# normalized in the same way; note that the segmentation splits words before a
+# final "ing".  Identical occurrences within a paragraph are listed once.
+# With --term-index=terms.json, lb_differ writes the index, which can then be
+# queried without rebuilding the history:
+#   python term_provenance.py --index=terms.json --term=ZWJ
+
+def normalize(token: str) -> Optional[str]:
+  term = token.casefold()
+  return term if any(c.isalnum() for c in term) else None
+
+def parse_version(s: Optional[str]) -> Optional[Version]:
+  return Version(*(int(v) for v in s.split("."))) if s else None
+
+class TermIndex:
+  def __init__(self):
+    self.terms : dict[str, list[tuple[ParagraphNumber, Version, Optional[Version]]]] = {}
+
+  @staticmethod
+  def from_history(history: SequenceHistory) -> "TermIndex":
+    index = TermIndex()
+    for paragraph_number, paragraph in history.elements:
+      seen = set()
+      for _, c in paragraph.elements:
+        term = normalize(c.text)
+        if term and (term, c.added, c.removed) not in seen:
+          seen.add((term, c.added, c.removed))
+          index.terms.setdefault(term, []).append((paragraph_number, c.added, c.removed))
+    return index
+
+  def occurrences(self, query: str) -> list[tuple[ParagraphNumber, Version, Optional[Version]]]:
+    return self.terms.get(normalize(query) or "", [])
+
+  # The version in which the term first appeared, or None if it never did.
+  def first_added(self, query: str) -> Optional[Version]:
+    return min((added for _, added, _ in self.occurrences(query)), default=None)
+
+  # The version in which the last occurrence of the term was removed, or None
+  # if it is still present (or never appeared).
+  def last_removed(self, query: str) -> Optional[Version]:
+    occurrences = self.occurrences(query)
+    if not occurrences or any(removed is None for _, _, removed in occurrences):
+      return None
+    return max(removed for _, _, removed in occurrences)
+
+  # The index as JSON: the paragraph numbers, and for each term a flat list
+  # [paragraph, added, removed, paragraph, added, removed...], where paragraph
+  # is an index into the paragraph numbers, and the versions are strings or
+  # null.
+  def write(self, path: str):
+    numbers : dict[ParagraphNumber, int] = {}
+    terms = {}
+    for term, occurrences in sorted(self.terms.items()):
+      flat = terms[term] = []
+      for number, added, removed in occurrences:
+        flat.extend((numbers.setdefault(number, len(numbers)),
+                     str(added), str(removed) if removed else None))
+    with open(path, "w", encoding="utf-8") as f:
+      json.dump({"paragraphs": [[*number.main, *number.annotation] for number in numbers],
+                 "terms": terms},
+                f, ensure_ascii=False, separators=(",", ":"))
+
+  @staticmethod
+  def read(path: str) -> "TermIndex":
+    with open(path, encoding="utf-8") as f:
+      data = json.load(f)
+    numbers = [ParagraphNumber(*number) for number in data["paragraphs"]]
+    index = TermIndex()
+    for term, flat in data["terms"].items():
+      index.terms[term] = [(numbers[flat[i]], parse_version(flat[i + 1]), parse_version(flat[i + 2]))
+                           for i in range(0, len(flat), 3)]
+    return index
+
+if __name__ == "__main__":
+  args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+  if "index" not in args or "term" not in args:
+    print("Usage: term_provenance.py --index=terms.json --term=ZWJ [--occurrences=]")
+    sys.exit(1)
+  index = TermIndex.read(args["index"])
+  for token in split_words(args["term"]):
+    if not normalize(token):
+      continue
+    occurrences = index.occurrences(token)
+    if not occurrences:
+      print(f"{token}: never appeared")
+      continue
+    last_removed = index.last_removed(token)
+    print(f"{token}: first added in {index.first_added(token)}, " +
+          (f"last removed in {last_removed}" if last_removed else "still present") +
+          f", {len(occurrences)} occurrences in {len(set(number for number, _, _ in occurrences))} paragraphs")
+    if "occurrences" in args:
+      for number, added, removed in occurrences:
+        print(f"  {number}: added in {added}" + (f", removed in {removed}" if removed else ""))
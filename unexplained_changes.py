@@ -0,0 +1,42 @@
+import json
+import sys
+from typing import Sequence, TextIO
+
+from historical_diff import Version, ParagraphNumber, SequenceHistory
+
+# The paragraphs changed in each version without an issue of that version
+# among their references, gathered in one pass over a built history whose
+# references have been resolved.  The first version is not reported, since
+# everything was added in it.  The lists are printed as paragraphs=[...]
+# arguments, ready to be pasted into an Issue of annotations.py.
+
+def unexplained_changes(history: SequenceHistory,
+                        versions: Sequence[Version]) -> dict[Version, list[ParagraphNumber]]:
+  report = {version: [] for version in sorted(versions)[1:]}
+  for paragraph_number, paragraph in history.elements:
+    explained = set(issue.version for issue in paragraph.references)
+    for version in paragraph.versions_changed():
+      if version in report and version not in explained:
+        report[version].append(paragraph_number)
+  return report
+
+def format_paragraphs(paragraphs: Sequence[ParagraphNumber]) -> str:
+  return "paragraphs=[\n" + "".join(f"    {number!r},\n" for number in paragraphs) + "]"
+
+# Prints the number of unexplained changes in each version, and the
+# paragraphs=[...] argument for the given versions.
+def print_unexplained_changes(report: dict[Version, list[ParagraphNumber]],
+                              paste_versions: Sequence[Version], f: TextIO = sys.stdout):
+  for version, paragraphs in report.items():
+    if paragraphs:
+      print(f"{len(paragraphs)} paragraphs changed in {version} without an issue of that version", file=f)
+  for version in paste_versions:
+    if report.get(version):
+      print(f"Unexplained changes in {version}:", file=f)
+      print(format_paragraphs(report[version]), file=f)
+
+def write_unexplained_changes(report: dict[Version, list[ParagraphNumber]], path: str):
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump({str(version): [str(number) for number in paragraphs]
+               for version, paragraphs in report.items()},
+              f, indent=1)
@@ -1,5 +1,8 @@
+import bisect
+import csv
 from datetime import date, timedelta
 import sys
+from typing import Optional
 
 OFFSET = 44
 UTC = [
@@ -148,45 +151,183 @@ UTC = [
     (date(2024, 7, 23), 3),  # UTC #180
 ]
 
-for i, (start, duration) in enumerate(UTC):
-    utc_number = OFFSET + i
-    for n in range(duration):
-        weekday = ((start + timedelta(days=n)).isocalendar().weekday)
-        if weekday in (6, 7) and utc_number not in (70,):
-            raise ValueError(f"UTC #{utc_number} overlaps with a weekend")
-
-t = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date.today()
-
-next_utc = next(i for i, (date, duration) in enumerate(UTC) if date > t)
-#print(next_utc)
-days_to_next_utc = (UTC[next_utc][0] - t).days
-days_since_previous_utc = (t - UTC[next_utc - 1][0]).days
-previous_utc_duration = UTC[next_utc - 1][1]
-if days_since_previous_utc < previous_utc_duration:
-    # During UTC
-    utc_number = OFFSET + next_utc - 1
-    n = days_since_previous_utc + 1
-    if utc_number >= 164 and utc_number <= 171:  # COVID.
-        if n == 2:
-            print(t.strftime(f"%A between the two days of UTC #{utc_number}"))
-        else:
-            print(t.strftime("%A, ") +
-                ("first " if n == 1 else "second ") +
-                f"day of UTC #{utc_number}")
-    else:
-        print(t.strftime("%A, ") +
-            (("first " if n == 1 else
-            "second " if n == 2 else
-            "third " if n == 3 else
-            f"{n}th ") if previous_utc_duration > 1 else "") +
-            f"day of UTC #{utc_number}")
-elif days_to_next_utc <= 7:
-    print(t.strftime("%A ") + f"before UTC #{OFFSET + next_utc}")
-else:
+# The start dates of the meetings, in order, for bisection.
+DATES = [start for start, _ in UTC]
+
+# Meetings during which the days are split, the second day being a gap
+# between the two days of the meeting.
+COVID = range(164, 172)
+
+_validated = False
+
+# Checks, on first use, that no meeting overlaps with a weekend.
+def validate():
+    global _validated
+    if _validated:
+        return
+    for i, (start, duration) in enumerate(UTC):
+        utc_number = OFFSET + i
+        for n in range(duration):
+            weekday = ((start + timedelta(days=n)).isocalendar().weekday)
+            if weekday in (6, 7) and utc_number not in (70,):
+                raise ValueError(f"UTC #{utc_number} overlaps with a weekend")
+    _validated = True
+
+# The index in UTC of the first meeting starting after t, or len(UTC).
+def _next_index(t: date) -> int:
+    validate()
+    return bisect.bisect_right(DATES, t)
+
+# The (UTC number, day of the meeting starting at 1) of the meeting taking
+# place on t, or None; as in meeting_days, the gap of the meetings in COVID is
+# not a day of the meeting, and the day after it is their second day.
+def meeting_on(t: date) -> Optional[tuple[int, int]]:
+    i = _next_index(t) - 1
+    if i >= 0 and (t - DATES[i]).days < UTC[i][1]:
+        utc_number = OFFSET + i
+        n = (t - DATES[i]).days + 1
+        if utc_number in COVID:
+            if n == 2:
+                return None
+            if n > 2:
+                n -= 1
+        return utc_number, n
+    return None
+
+# The UTC number of the first meeting starting after t, or None if it is not
+# yet in the calendar.
+def next_meeting(t: date) -> Optional[int]:
+    i = _next_index(t)
+    return OFFSET + i if i < len(UTC) else None
+
+# The number of weeks from t to the week of the next meeting, 1 if it is next
+# week, or None if that meeting is not yet in the calendar.
+def weeks_until(t: date) -> Optional[int]:
+    i = _next_index(t)
+    return _weeks_until(t, i) if i < len(UTC) else None
+
+def _weeks_until(t: date, next_utc: int) -> int:
     year, week = UTC[next_utc][0].isocalendar()[:2]
     start_of_utc_week = date.fromisocalendar(year, week, 1)
-    weeks = ((start_of_utc_week - t).days - 1) // 7 + 1
-    print(t.strftime("%A, ") +
+    return ((start_of_utc_week - t).days - 1) // 7 + 1
+
+# The description of t relative to the meetings, given the index in UTC of the
+# first meeting starting after t.
+def _describe(t: date, next_utc: int) -> str:
+    if next_utc > 0:
+        days_since_previous_utc = (t - UTC[next_utc - 1][0]).days
+        previous_utc_duration = UTC[next_utc - 1][1]
+        if days_since_previous_utc < previous_utc_duration:
+            # During UTC
+            utc_number = OFFSET + next_utc - 1
+            n = days_since_previous_utc + 1
+            if utc_number in COVID:
+                if n == 2:
+                    return t.strftime(f"%A between the two days of UTC #{utc_number}")
+                return (t.strftime("%A, ") +
+                    ("first " if n == 1 else "second ") +
+                    f"day of UTC #{utc_number}")
+            return (t.strftime("%A, ") +
+                (("first " if n == 1 else
+                "second " if n == 2 else
+                "third " if n == 3 else
+                f"{n}th ") if previous_utc_duration > 1 else "") +
+                f"day of UTC #{utc_number}")
+    if next_utc == len(UTC):
+        return t.strftime("%A, ") + f"after UTC #{OFFSET + len(UTC) - 1}"
+    days_to_next_utc = (UTC[next_utc][0] - t).days
+    if days_to_next_utc <= 7:
+        return t.strftime("%A ") + f"before UTC #{OFFSET + next_utc}"
+    weeks = _weeks_until(t, next_utc)
+    return (t.strftime("%A, ") +
         ("last week" if weeks == 1 else
          f"{weeks} weeks") +
-         f" before UTC #{OFFSET + next_utc}")
\ No newline at end of file
+         f" before UTC #{OFFSET + next_utc}")
+
+def describe(t: date) -> str:
+    return _describe(t, _next_index(t))
+
+# The descriptions of the days from first to last inclusive.  This is a plain
+# loop over the days, but the next meeting is found by bisection only for the
+# first day; for the following days, its index is moved forward as needed.
+def describe_range(first: date, last: date) -> list[tuple[date, str]]:
+    next_utc = _next_index(first)
+    descriptions = []
+    t = first
+    while t <= last:
+        while next_utc < len(UTC) and DATES[next_utc] <= t:
+            next_utc += 1
+        descriptions.append((t, _describe(t, next_utc)))
+        t += timedelta(days=1)
+    return descriptions
+
+# The (date, UTC number, day of the meeting, description) of each day of the
+# meetings that are in progress on or start after since, in order; the second
+# day of the meetings in COVID is a gap, and is skipped, so that their third
+# day is their second day.
+def meeting_days(since: Optional[date] = None):
+    validate()
+    first = max(0, bisect.bisect_right(DATES, since) - 1) if since else 0
+    for i in range(first, len(UTC)):
+        start, duration = UTC[i]
+        utc_number = OFFSET + i
+        day = 0
+        for n in range(duration):
+            if utc_number in COVID and n == 1:
+                continue
+            day += 1
+            t = start + timedelta(days=n)
+            if since and t < since:
+                continue
+            yield t, utc_number, day, _describe(t, i + 1)
+
+def _ics_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+
+# Writes the days of meetings as all-day iCalendar events to ics, and as
+# comma-separated values to csv_file, in one pass.
+def export(ics, csv_file, since: Optional[date] = None):
+    if ics:
+        ics.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//unicode-annotations//utc_calendar//EN\r\n")
+    if csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(("date", "meeting", "day", "description"))
+    for t, utc_number, day, description in meeting_days(since):
+        if ics:
+            ics.write("BEGIN:VEVENT\r\n"
+                      f"UID:utc-{utc_number}-{day}@unicode-annotations\r\n"
+                      f"DTSTAMP:{t.strftime('%Y%m%d')}T000000Z\r\n"
+                      f"DTSTART;VALUE=DATE:{t.strftime('%Y%m%d')}\r\n"
+                      f"DTEND;VALUE=DATE:{(t + timedelta(days=1)).strftime('%Y%m%d')}\r\n"
+                      f"SUMMARY:UTC #{utc_number}\\, day {day}\r\n"
+                      f"DESCRIPTION:{_ics_text(description)}\r\n"
+                      "END:VEVENT\r\n")
+        if csv_file:
+            writer.writerow((t.isoformat(), utc_number, day, description))
+    if ics:
+        ics.write("END:VCALENDAR\r\n")
+
+if __name__ == "__main__":
+    # python utc_calendar.py [2024-07-23] describes the given day, or today;
+    # python utc_calendar.py --from=2024-01-01 --to=2024-12-31 describes every
+    # day in that range, one per line.
+    args = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--"))
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    # python utc_calendar.py --ics=utc.ics --csv=utc.csv [--since=2024-01-01]
+    # exports the days of the meetings (those in progress on or after the
+    # given day).
+    if "ics" in args or "csv" in args:
+        since = date.fromisoformat(args["since"]) if args.get("since") else None
+        ics = open(args["ics"], "w", encoding="utf-8", newline="") if args.get("ics") else None
+        csv_file = open(args["csv"], "w", encoding="utf-8", newline="") if args.get("csv") else None
+        export(ics, csv_file, since)
+        for f in (ics, csv_file):
+            if f:
+                f.close()
+    elif "from" in args or "to" in args:
+        first = date.fromisoformat(args["from"]) if "from" in args else date.today()
+        last = date.fromisoformat(args["to"]) if "to" in args else first
+        for t, description in describe_range(first, last):
+            print(f"{t.isoformat()}\t{description}")
+    else:
+        print(describe(date.fromisoformat(positional[0]) if positional else date.today()))
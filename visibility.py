@@ -0,0 +1,80 @@
+import bisect
+import json
+from typing import Optional, Sequence
+
+from historical_diff import Version, SequenceHistory
+
+# Version bitmasks of the paragraphs of a built history and of their runs of
+# tokens, over a sorted list of versions: bit j stands for versions[j].
+#   present: the versions in which the paragraph (or run) exists, from the
+#     version in which it was added, up to but excluding the one in which it
+#     was removed;
+#   changed: the versions in which the paragraph was added or changed, or the
+#     run added or removed;
+#   moved: the versions in which the run was part of a phrase moved within its
+#     paragraph (see moved_phrases.py).
+# Whether a paragraph is shown when comparing base with head, or has changed
+# between them, is then an AND with the mask of the versions from base to
+# head.  write_visibility exports the masks as JSON, with the same layout as
+# the search index, for use by scripts; masks fit in 32-bit integers as long as
+# there are at most 31 versions.
+
+class VisibilityIndex:
+  def __init__(self, history: SequenceHistory, versions: Sequence[Version]):
+    self.versions = sorted(versions)
+    self.numbers = []
+    self.present : list[int] = []
+    self.changed : list[int] = []
+    self.runs : list[list[tuple[int, int, int]]] = []
+    for paragraph_number, paragraph in history.elements:
+      self.numbers.append(paragraph_number)
+      removed = paragraph.last_changed() if paragraph.absent() else None
+      self.present.append(self.span(paragraph.version_added(), removed))
+      self.changed.append(self.mask(paragraph.versions_changed()))
+      runs = []
+      previous = None
+      for _, c in paragraph.elements:
+        if (c.added, c.removed, c.moved_in) == previous:
+          runs[-1][0] += len(c.value())
+        else:
+          runs.append([len(c.value()), self.span(c.added, c.removed), self.mask(c.moved_in)])
+          previous = (c.added, c.removed, c.moved_in)
+      self.runs.append([tuple(run) for run in runs])
+
+  # The index of the first of self.versions that is not older than version.
+  def index(self, version: Optional[Version]) -> int:
+    return len(self.versions) if version is None else bisect.bisect_left(self.versions, version)
+
+  def mask(self, versions: Sequence[Version]) -> int:
+    mask = 0
+    for version in versions:
+      if version:
+        mask |= 1 << self.index(version)
+    return mask
+
+  # The versions from first (inclusive) to last (exclusive, or all remaining
+  # versions if last is None).
+  def span(self, first: Version, last: Optional[Version] = None) -> int:
+    return (1 << self.index(last)) - (1 << self.index(first))
+
+  # The versions from base to head, inclusive.
+  def between(self, base: Version, head: Version) -> int:
+    return (1 << (self.index(head) + 1)) - (1 << self.index(base))
+
+  def visible_paragraphs(self, base: Version, head: Version) -> list[int]:
+    versions = self.between(base, head)
+    return [i for i, present in enumerate(self.present) if present & versions]
+
+def write_visibility(index: VisibilityIndex, path: str):
+  if len(index.versions) > 31:
+    raise ValueError("the masks are meant to be used as 32-bit integers")
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump({"versions": [version.html_class() for version in index.versions],
+               "paragraphs": [str(number) for number in index.numbers],
+               "present": index.present,
+               "changed": index.changed,
+               # For each paragraph, a flat list [length, present, moved,
+               # length, present, moved...] of its runs, where length is in
+               # code points.
+               "runs": [[value for run in runs for value in run] for runs in index.runs]},
+              f, separators=(",", ":"))